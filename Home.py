@@ -1,16 +1,6 @@
 import streamlit as st
 from utils import require_login, init_session_state
 
-# Add custom CSS for title fonts
-st.markdown("""
-<style>
-h1, h2, h3, h4, h5, h6 {
-    font-family: 'CormorantGaramond', serif !important;
-    font-weight: 500 !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
 init_session_state()
 user = require_login()
 
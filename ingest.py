@@ -0,0 +1,508 @@
+"""Incremental import of the 0_DB spreadsheets into MYAdb.db.
+
+Replaces the notebook ETL. Each workbook is fingerprinted and skipped when
+unchanged; changed workbooks are streamed with openpyxl in a process pool,
+reshaped, normalized by validation.RULES, and then diffed against the stored table by natural key, so only new, changed
+and removed rows are written. A table that is missing or whose columns
+changed is rebuilt instead, by loading a staging table and swapping it in.
+
+    python ingest.py                      # sync every changed workbook
+    python ingest.py "Service Database"   # only some tables
+    python ingest.py --force              # ignore fingerprints
+    python ingest.py --rebuild            # reload tables wholesale
+    python ingest.py --workers 1          # parse in this process
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_integer_dtype, is_numeric_dtype
+
+from migrations import run_maintenance
+from validation import VIOLATION_COLUMNS, VIOLATIONS_TABLE, overflow_columns, record_violations, validate
+from utils import (
+    FEEDBACK_TABLE,
+    PARTNER_TABLE,
+    SERVICE_TABLE,
+    TOUR_TABLE,
+    _sql_value,
+    bulk_write_connection,
+    bump_table_version,
+    get_table_columns,
+    quote_ident,
+    reset_derived_tables,
+    write_connection,
+)
+
+SOURCE_DIR = "0_DB"
+INGEST_FILES_TABLE = "_ingest_files"
+STAGING_PREFIX = "_staging_"
+CHUNK_ROWS = 5000
+OCCURRENCE_COLUMN = "__occurrence"
+
+
+# -----------------
+# Cleaning (ported from the notebook)
+# -----------------
+# Cleaning steps reshape one streamed chunk at a time, so they must be
+# row-wise. Value-level normalization lives in validation.RULES.
+
+def melt_tour_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn the "2 pax" … "14pax" price columns into num_pax / price rows."""
+    pax_cols = [c for c in df.columns if re.fullmatch(r"\s*\d+\s*pax\s*", str(c))]
+    if not pax_cols:
+        # Sheet is already in long form
+        return df
+    id_cols = [c for c in df.columns if c not in pax_cols]
+    n = len(df)
+    # Same layout as DataFrame.melt (all rows for the first pax column, then
+    # the next), built with one gather instead of per-column frames; the
+    # index keeps each row's source sheet row
+    long = df[id_cols].iloc[np.tile(np.arange(n), len(pax_cols))]
+    long["num_pax"] = np.repeat([int(re.search(r"\d+", str(c)).group()) for c in pax_cols], n)
+    long["price"] = df[pax_cols].to_numpy().T.ravel()
+    return long
+
+
+# table -> workbook, natural key columns and cleaning. Keys need not be
+# unique: repeated keys are told apart by their order of appearance.
+# drop_empty drops columns that are blank in the whole sheet.
+SOURCES: Dict[str, Dict[str, Any]] = {
+    PARTNER_TABLE: {
+        "file": "Main Travel Database.xlsx",
+        "key": ["Partner ID"],
+        "drop_empty": True,
+        "clean": None,
+    },
+    FEEDBACK_TABLE: {
+        "file": "Feedback Database.xlsx",
+        "key": ["Partner ID", "Date", "Group Number"],
+        "drop_empty": True,
+        "clean": None,
+    },
+    SERVICE_TABLE: {
+        "file": "Service Database.xlsx",
+        "key": ["Partner ID", "Group", "Type of service", "Details"],
+        "drop_empty": True,
+        "clean": None,
+    },
+    TOUR_TABLE: {
+        "file": "MYA Tour Database.xlsx",
+        "key": ["Country", "Region/City", "Tour Name", "num_pax"],
+        "drop_empty": False,
+        "clean": melt_tour_prices,
+    },
+}
+
+
+# -----------------
+# Fingerprints
+# -----------------
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ensure_ingest_files(conn) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {quote_ident(INGEST_FILES_TABLE)} (
+            path TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            ingested_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _is_unchanged(conn, path: str, table_name: str) -> Tuple[bool, Optional[str]]:
+    """(unchanged?, sha256 if it had to be computed)."""
+    stat = os.stat(path)
+    row = conn.execute(
+        f"SELECT size, mtime_ns, sha256 FROM {quote_ident(INGEST_FILES_TABLE)} WHERE path = ? AND table_name = ?",
+        (path, table_name),
+    ).fetchone()
+    if row is None or get_table_columns(conn, table_name).empty:
+        return False, None
+    if row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+        return True, row[2]
+    sha = file_fingerprint(path)
+    return sha == row[2], sha
+
+
+def _record_fingerprint(conn, path: str, table_name: str, sha: str, row_count: int) -> None:
+    stat = os.stat(path)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {quote_ident(INGEST_FILES_TABLE)}"
+        "(path, table_name, size, mtime_ns, sha256, row_count, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (path, table_name, stat.st_size, stat.st_mtime_ns, sha, row_count, time.strftime("%Y-%m-%d %H:%M:%S")),
+    )
+
+
+# -----------------
+# Diffing
+# -----------------
+
+def _canonical(series: pd.Series) -> pd.Series:
+    """Render values the same way whether they came from Excel or from SQLite.
+
+    Numbers (including numbers a TEXT column stored as text) are rounded so
+    last-digit noise from float formatting is not seen as a change.
+    """
+    if is_numeric_dtype(series) and not is_bool_dtype(series):
+        text = series.astype("float64").round(9).astype(str)
+    else:
+        numbers = pd.to_numeric(series, errors="coerce").astype("float64")
+        text = series.astype(str).where(numbers.isna(), numbers.round(9).astype(str))
+    return text.where(series.notna(), "")
+
+
+def _natural_index(df: pd.DataFrame, key: Sequence[str]) -> pd.MultiIndex:
+    canon = pd.DataFrame({c: _canonical(df[c]) for c in key}, index=df.index)
+    canon[OCCURRENCE_COLUMN] = canon.groupby(list(key), sort=False).cumcount()
+    return pd.MultiIndex.from_frame(canon)
+
+
+def _row_hashes(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    canon = pd.DataFrame({c: _canonical(df[c]) for c in columns}, index=df.index)
+    return pd.util.hash_pandas_object(canon, index=False).to_numpy()
+
+
+def plan_upsert(existing: pd.DataFrame, incoming: pd.DataFrame, key: Sequence[str]) -> Dict[str, Any]:
+    """Compare stored rows (indexed by rowid) with incoming rows by natural key.
+
+    Returns {"insert": incoming rows, "update": incoming rows indexed by the
+    rowid they replace, "delete": [rowids]}.
+    """
+    columns = list(incoming.columns)
+    existing_keys = _natural_index(existing, key)
+    incoming_keys = _natural_index(incoming, key)
+
+    is_new = ~incoming_keys.isin(existing_keys)
+    is_gone = ~existing_keys.isin(incoming_keys)
+
+    existing_hash = pd.Series(_row_hashes(existing, columns), index=existing_keys)
+    existing_rowid = pd.Series(existing.index.to_numpy(), index=existing_keys)
+    common = incoming_keys[~is_new]
+    incoming_hash = _row_hashes(incoming[~is_new], columns)
+    changed = existing_hash.reindex(common).to_numpy() != incoming_hash
+
+    updates = incoming[~is_new][changed].copy()
+    updates.index = existing_rowid.reindex(common[changed]).to_numpy()
+    return {
+        "insert": incoming[is_new],
+        "update": updates,
+        "delete": existing.index[is_gone].tolist(),
+    }
+
+
+# -----------------
+# Writing
+# -----------------
+
+def _chunks(rows: Sequence[Any], size: int = CHUNK_ROWS) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _records(df: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    return [tuple(_sql_value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+
+def _declared_type(series: pd.Series) -> str:
+    if is_integer_dtype(series) or is_bool_dtype(series):
+        return "INTEGER"
+    if is_numeric_dtype(series):
+        return "REAL"
+    return "TEXT"
+
+
+def bulk_load_table(table_name: str, df: pd.DataFrame) -> None:
+    """Replace a table wholesale without readers ever seeing it partial or missing.
+
+    The rows are loaded into a staging table with declared column types in
+    one bulk transaction. A second, short transaction drops the old table,
+    renames the staging table into place and rebuilds the indexes and
+    derived tables that depended on it, so readers switch from the old data
+    to the complete new data in a single commit.
+    """
+    staging = STAGING_PREFIX + re.sub(r"[^0-9a-z_]+", "_", table_name.lower())
+    column_sql = ", ".join(f"{quote_ident(c)} {_declared_type(df[c])}" for c in df.columns)
+    with bulk_write_connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {quote_ident(staging)}")
+        conn.execute(f"CREATE TABLE {quote_ident(staging)} ({column_sql})")
+        _insert_rows(conn, staging, df)
+
+    with write_connection() as conn:
+        # Triggers on other tables name this table; with the table briefly gone,
+        # the modern RENAME would refuse to re-parse them
+        conn.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_ident(table_name)}")
+            conn.execute(f"ALTER TABLE {quote_ident(staging)} RENAME TO {quote_ident(table_name)}")
+        finally:
+            conn.execute("PRAGMA legacy_alter_table=OFF")
+        # Dropping the old table took its indexes and triggers with it
+        reset_derived_tables()
+        run_maintenance()
+
+
+def _insert_rows(conn, table_name: str, df: pd.DataFrame) -> None:
+    col_sql = ", ".join(quote_ident(c) for c in df.columns)
+    placeholders = ", ".join(["?"] * len(df.columns))
+    sql = f"INSERT INTO {quote_ident(table_name)} ({col_sql}) VALUES ({placeholders})"
+    for chunk in _chunks(_records(df)):
+        conn.executemany(sql, chunk)
+
+
+def _apply_plan(conn, table_name: str, plan: Dict[str, Any]) -> None:
+    table = quote_ident(table_name)
+    for chunk in _chunks([(rowid,) for rowid in plan["delete"]]):
+        conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", chunk)
+
+    updates = plan["update"]
+    if not updates.empty:
+        set_sql = ", ".join(f"{quote_ident(c)} = ?" for c in updates.columns)
+        rows = [r + (int(rowid),) for r, rowid in zip(_records(updates), updates.index)]
+        for chunk in _chunks(rows):
+            conn.executemany(f"UPDATE {table} SET {set_sql} WHERE rowid = ?", chunk)
+
+    if not plan["insert"].empty:
+        _insert_rows(conn, table_name, plan["insert"])
+
+
+# -----------------
+# Parsing
+# -----------------
+
+def stream_sheet(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield the first worksheet as DataFrame chunks using openpyxl's read-only mode."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        batch: List[Tuple[Any, ...]] = []
+        row_numbers: List[int] = []
+        blank_run: List[Tuple[int, Tuple[Any, ...]]] = []
+        # Frames are indexed by sheet row number (the header is row 1)
+        for row_number, row in enumerate(rows, start=2):
+            # Blank rows are kept like pd.read_excel does, except trailing ones
+            if all(v is None for v in row):
+                blank_run.append((row_number, row))
+                continue
+            for blank_number, blank in blank_run:
+                row_numbers.append(blank_number)
+                batch.append(blank)
+            blank_run = []
+            row_numbers.append(row_number)
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=columns, index=row_numbers)
+                batch, row_numbers = [], []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns, index=row_numbers)
+    finally:
+        workbook.close()
+
+
+def _iso_dates(df: pd.DataFrame) -> pd.DataFrame:
+    # Dates are stored as ISO text, the way the CSV round trip stored them
+    for col in df.columns:
+        if is_datetime64_any_dtype(df[col]):
+            values = df[col]
+            has_time = (values.dropna() != values.dropna().dt.normalize()).any()
+            df[col] = values.dt.strftime("%Y-%m-%d %H:%M:%S" if has_time else "%Y-%m-%d").where(values.notna(), None)
+    return df
+
+
+def parse_source(table_name: str, path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Read, clean and validate one workbook; runs inside a worker process.
+
+    Returns (rows, validation violations). Each streamed chunk is cleaned and
+    validated as it arrives and the raw chunk is then dropped, so the raw
+    sheet is never held whole. Memory is not constant: the validated rows are
+    kept, since the caller diffs the complete table against the stored one.
+    """
+    spec = SOURCES[table_name]
+    parts: List[pd.DataFrame] = []
+    found: List[pd.DataFrame] = []
+    seen: Dict[str, Dict[Any, Any]] = {}
+    filled: Optional[pd.Series] = None
+    for chunk in stream_sheet(path):
+        chunk_filled = chunk.notna().any()
+        filled = chunk_filled if filled is None else filled | chunk_filled
+        if spec["clean"] is not None:
+            chunk = spec["clean"](chunk)
+        rows, violations = validate(table_name, chunk, seen)
+        parts.append(rows)
+        if not violations.empty:
+            found.append(violations)
+    if not parts:
+        return pd.DataFrame(), pd.DataFrame(columns=VIOLATION_COLUMNS)
+    df = pd.concat(parts)
+    del parts
+    if spec["drop_empty"]:
+        # Blank in the whole sheet; overflow columns are kept even when empty
+        keep = overflow_columns(table_name)
+        blank = [c for c in filled.index[~filled] if c in df.columns and c not in keep]
+        df = df.drop(columns=blank)
+    violations = pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return _iso_dates(df.reset_index(drop=True)), violations
+
+
+def _timed_parse(table_name: str, path: str) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    started = time.perf_counter()
+    df, violations = parse_source(table_name, path)
+    return df, violations, time.perf_counter() - started
+
+
+def parse_sources(
+    jobs: Dict[str, str], workers: Optional[int] = None
+) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame, float]]:
+    """Parse {table: workbook path} concurrently; returns {table: (frame, violations, seconds)}."""
+    workers = min(len(jobs), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return {t: _timed_parse(t, path) for t, path in jobs.items()}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {t: pool.submit(_timed_parse, t, path) for t, path in jobs.items()}
+        return {t: future.result() for t, future in futures.items()}
+
+
+# -----------------
+# Driver
+# -----------------
+
+def _new_report(table_name: str) -> Dict[str, Any]:
+    return {"table": table_name, "status": "skipped", "rows": 0, "inserted": 0, "updated": 0, "deleted": 0,
+            "issues": 0, "read_s": 0.0, "write_s": 0.0}
+
+
+def write_table(
+    table_name: str,
+    incoming: pd.DataFrame,
+    violations: pd.DataFrame,
+    path: str,
+    sha: str,
+    report: Dict[str, Any],
+    rebuild: bool = False,
+) -> None:
+    """Upsert (or rebuild) one table from its parsed frame; record violations and fingerprint.
+
+    Missing tables, changed columns and rebuild=True go through bulk_load_table().
+    """
+    spec = SOURCES[table_name]
+    report["rows"] = len(incoming)
+    report["issues"] = len(violations)
+    started = time.perf_counter()
+    key = [c for c in spec["key"] if c in incoming.columns]
+    with write_connection() as conn:
+        stored_cols = get_table_columns(conn, table_name)["name"].tolist()
+    if rebuild or stored_cols != list(incoming.columns) or not key:
+        bulk_load_table(table_name, incoming)
+        report.update(status="rebuilt", inserted=len(incoming))
+        with write_connection() as conn:
+            record_violations(conn, table_name, violations)
+            _record_fingerprint(conn, path, table_name, sha, len(incoming))
+    else:
+        with write_connection() as conn:
+            existing = pd.read_sql(f"SELECT rowid, * FROM {quote_ident(table_name)}", conn).set_index("rowid")
+            plan = plan_upsert(existing, incoming, key)
+            _apply_plan(conn, table_name, plan)
+            report.update(
+                status="upserted",
+                inserted=len(plan["insert"]),
+                updated=len(plan["update"]),
+                deleted=len(plan["delete"]),
+            )
+            record_violations(conn, table_name, violations)
+            _record_fingerprint(conn, path, table_name, sha, len(incoming))
+    bump_table_version(table_name)
+    report["write_s"] = time.perf_counter() - started
+
+
+def ingest(
+    tables: Optional[Sequence[str]] = None,
+    source_dir: str = SOURCE_DIR,
+    force: bool = False,
+    workers: Optional[int] = None,
+    rebuild: bool = False,
+) -> List[Dict[str, Any]]:
+    """Sync tables from their workbooks; returns one report per table."""
+    tables = list(tables or SOURCES)
+    reports = {t: _new_report(t) for t in tables}
+
+    # Fingerprint check, then parse only changed workbooks in parallel
+    pending: Dict[str, Tuple[str, Optional[str]]] = {}
+    with write_connection() as conn:
+        _ensure_ingest_files(conn)
+        for t in tables:
+            path = os.path.join(source_dir, SOURCES[t]["file"])
+            unchanged, sha = _is_unchanged(conn, path, t)
+            if force or rebuild or not unchanged:
+                pending[t] = (path, sha)
+    parsed = parse_sources({t: path for t, (path, _) in pending.items()}, workers)
+
+    # Writes go through the single writer one table at a time
+    for t, (path, sha) in pending.items():
+        incoming, violations, reports[t]["read_s"] = parsed[t]
+        write_table(t, incoming, violations, path, sha or file_fingerprint(path), reports[t], rebuild)
+
+    return [reports[t] for t in tables]
+
+
+def _print_reports(reports: List[Dict[str, Any]], elapsed: float) -> None:
+    print(
+        f"{'table':<24} {'status':<9} {'rows':>8} {'+new':>7} {'~chg':>7} {'-del':>7} {'issues':>7} "
+        f"{'read s':>8} {'write s':>8}"
+    )
+    for r in reports:
+        print(
+            f"{r['table']:<24} {r['status']:<9} {r['rows']:>8} {r['inserted']:>7} {r['updated']:>7} "
+            f"{r['deleted']:>7} {r['issues']:>7} {r['read_s']:>8.2f} {r['write_s']:>8.2f}"
+        )
+    if any(r["issues"] for r in reports):
+        print(f"validation issues are listed in {VIOLATIONS_TABLE}")
+    print(f"done in {elapsed:.2f}s")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sync the 0_DB workbooks into MYAdb.db.")
+    parser.add_argument("tables", nargs="*", help=f"tables to sync (default: all of {', '.join(SOURCES)})")
+    parser.add_argument("--source-dir", default=SOURCE_DIR, help="folder holding the workbooks")
+    parser.add_argument("--force", action="store_true", help="re-read workbooks even if unchanged")
+    parser.add_argument("--rebuild", action="store_true", help="reload tables wholesale instead of upserting")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    unknown = [t for t in args.tables if t not in SOURCES]
+    if unknown:
+        parser.error(f"unknown table(s): {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    reports = ingest(args.tables, args.source_dir, args.force, args.workers, args.rebuild)
+    _print_reports(reports, time.perf_counter() - started)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
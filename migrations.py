@@ -0,0 +1,198 @@
+"""Schema migrations and index maintenance for MYAdb.db.
+
+Versioned migrations run once per database and are recorded in
+_schema_migrations. Maintenance steps are idempotent and run once per
+process, because the business tables can be replaced wholesale (e.g. by a
+re-import), which drops their indexes and triggers.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils import (
+    FEEDBACK_TABLE,
+    PARTNER_TABLE,
+    SERVICE_TABLE,
+    SESSIONS_TABLE,
+    TOUR_TABLE,
+    ensure_feedback_sentiment,
+    ensure_partner_search_index,
+    ensure_services_enriched,
+    ensure_users_table,
+    get_table_columns,
+    quote_ident,
+    read_connection,
+    reset_derived_tables,
+    write_connection,
+)
+
+MIGRATIONS_TABLE = "_schema_migrations"
+
+# Join and filter columns of the business tables; each tuple is one index.
+# Indexes whose columns are missing from a table are skipped.
+INDEX_SPECS: Dict[str, List[Tuple[str, ...]]] = {
+    PARTNER_TABLE: [
+        ("Partner ID",),
+        ("Partner Name",),
+        ("Country", "Location"),
+        ("Location",),
+        ("Status",),
+        ("Partner Type",),
+    ],
+    FEEDBACK_TABLE: [
+        ("Partner ID",),
+        ("Partner Name",),
+    ],
+    SERVICE_TABLE: [
+        ("Partner ID",),
+        ("Partner Name",),
+    ],
+    TOUR_TABLE: [
+        ("Country", "Region/City"),
+        ("Tour Name", "num_pax"),
+    ],
+}
+
+_migrate_lock = threading.Lock()
+_migrated = False
+
+
+def index_name(table_name: str, columns: Sequence[str]) -> str:
+    slug = "__".join([table_name] + list(columns)).lower()
+    return "ix_" + re.sub(r"[^0-9a-z_]+", "_", slug)
+
+
+def ensure_indexes(conn: sqlite3.Connection) -> List[str]:
+    """Create any missing INDEX_SPECS indexes; returns the names created."""
+    created = []
+    for table_name, specs in INDEX_SPECS.items():
+        cols = set(get_table_columns(conn, table_name)["name"].tolist())
+        if not cols:
+            continue
+        for columns in specs:
+            if not all(c in cols for c in columns):
+                continue
+            name = index_name(table_name, columns)
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='index' AND name = ?", (name,)
+            ).fetchone()
+            if exists:
+                continue
+            column_sql = ", ".join(quote_ident(c) for c in columns)
+            conn.execute(f"CREATE INDEX {quote_ident(name)} ON {quote_ident(table_name)}({column_sql})")
+            created.append(name)
+    if created:
+        conn.execute("ANALYZE")
+    return created
+
+
+# -----------------
+# Versioned migrations
+# -----------------
+
+def _users_role_column(conn: sqlite3.Connection) -> None:
+    # utils.ensure_users_table owns the Users schema, including the role column
+    ensure_users_table()
+
+
+def _business_indexes(conn: sqlite3.Connection) -> None:
+    ensure_indexes(conn)
+
+
+def _sessions_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {quote_ident(SESSIONS_TABLE)} (
+            session_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_ident('ix_' + SESSIONS_TABLE.strip('_') + '__username')} "
+        f"ON {quote_ident(SESSIONS_TABLE)}(username)"
+    )
+
+
+# (version, name, apply) in order; never renumber or edit applied entries
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "users_role_column", _users_role_column),
+    (2, "business_table_indexes", _business_indexes),
+    (3, "sessions_table", _sessions_table),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (MIGRATIONS_TABLE,)
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute(f"SELECT MAX(version) FROM {quote_ident(MIGRATIONS_TABLE)}").fetchone()
+    return int(row[0] or 0)
+
+
+def apply_migrations() -> List[str]:
+    """Apply pending migrations, each in its own transaction; returns the names applied."""
+    applied = []
+    with write_connection() as conn:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {quote_ident(MIGRATIONS_TABLE)} (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        current = get_schema_version(conn)
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        with write_connection() as conn:
+            apply(conn)
+            conn.execute(
+                f"INSERT INTO {quote_ident(MIGRATIONS_TABLE)}(version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, time.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        applied.append(name)
+    return applied
+
+
+def run_maintenance() -> None:
+    """Idempotent upkeep: indexes and the trigger-maintained derived tables."""
+    with write_connection() as conn:
+        ensure_indexes(conn)
+    ensure_partner_search_index()
+    ensure_feedback_sentiment()
+    ensure_services_enriched()
+
+
+def migrate(force: bool = False) -> Optional[List[str]]:
+    """Bring the database schema up to date; runs once per process unless forced.
+
+    Returns the migrations applied, or None if this process already ran it.
+    """
+    global _migrated
+    with _migrate_lock:
+        if _migrated and not force:
+            return None
+        if force:
+            reset_derived_tables()
+        applied = apply_migrations()
+        run_maintenance()
+        _migrated = True
+        return applied
+
+
+if __name__ == "__main__":
+    names = migrate()
+    with read_connection() as conn:
+        version = get_schema_version(conn)
+    print(f"Schema version {version}; applied: {', '.join(names) if names else 'nothing'}")
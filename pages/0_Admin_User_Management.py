@@ -1,20 +1,10 @@
 import streamlit as st
-from utils import require_login, is_admin, list_users, update_user_role, update_full_name, delete_user, change_password, create_user, show_logo
-
-# Add custom CSS for title fonts
-st.markdown("""
-<style>
-h1, h2, h3, h4, h5, h6 {
-    font-family: 'CormorantGaramond', serif !important;
-    font-weight: 500 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+import pandas as pd
+from utils import require_login, is_admin, list_users, update_user_role, update_full_name, delete_user, change_password, create_user, get_table_cache_stats, get_session_memory_report, get_auth_stats
 
 require_login()
 
 st.title("🛡️ Admin • User Management")
-show_logo()
 if not is_admin():
     st.error("You do not have permission to view this page.")
     st.stop()
@@ -108,4 +98,73 @@ else:
                         except Exception as e:
                             st.error(str(e))
 
+st.markdown("---")
+
+with st.expander("Diagnostics", expanded=False):
+    st.markdown("**Table cache**")
+    cache_stats = get_table_cache_stats()
+    total_lookups = cache_stats["hits"] + cache_stats["misses"]
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.metric("Cached tables", cache_stats["tables"])
+    with c2:
+        st.metric("Hits", cache_stats["hits"])
+    with c3:
+        st.metric("Misses", cache_stats["misses"])
+    with c4:
+        hit_rate = (cache_stats["hits"] / total_lookups * 100) if total_lookups else 0
+        st.metric("Hit rate", f"{hit_rate:.1f}%")
+
+    st.markdown("**Session memory**")
+    memory = get_session_memory_report()
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.metric("Active sessions", len(memory["sessions"]))
+    with c2:
+        st.metric("Snapshot memory", f"{memory['snapshot_bytes'] / 1024 / 1024:.1f} MB")
+    with c3:
+        st.metric("Session state", f"{memory['state_bytes'] / 1024 / 1024:.1f} MB")
+    with c4:
+        st.metric("Evicted snapshots", memory["evictions"])
+    st.caption(
+        f"Budget: {memory['session_budget_bytes'] / 1024 / 1024:.0f} MB per session, "
+        f"{memory['total_budget_bytes'] / 1024 / 1024:.0f} MB total"
+    )
+    if memory["sessions"]:
+        st.dataframe(
+            pd.DataFrame([
+                {k: v for k, v in session.items() if k != "keys"}
+                for session in memory["sessions"]
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+        key_rows = [
+            {"session": session["session"], "key": key, "bytes": size}
+            for session in memory["sessions"]
+            for key, size in session["keys"].items()
+        ]
+        if key_rows:
+            st.markdown("Largest keys")
+            st.dataframe(
+                pd.DataFrame(key_rows).sort_values("bytes", ascending=False).head(50),
+                use_container_width=True,
+                hide_index=True
+            )
 
+    st.markdown("**Sign-in hashing**")
+    auth = get_auth_stats()
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.metric("Hashes", auth["hashes"])
+    with c2:
+        st.metric("Hash p50 / p95", f"{auth['hash_ms']['p50']:.0f} / {auth['hash_ms']['p95']:.0f} ms")
+    with c3:
+        st.metric("Queue wait p95", f"{auth['wait_ms']['p95']:.0f} ms")
+    with c4:
+        st.metric("Throttled", auth["throttled_user"] + auth["throttled_ip"] + auth["busy"])
+    st.caption(
+        f"{auth['workers']} hash worker(s), up to {auth['queue_limit']} queued; "
+        f"throttled by user {auth['throttled_user']}, by address {auth['throttled_ip']}, pool full {auth['busy']}; "
+        f"legacy hashes upgraded {auth['legacy_upgrades']}; last {auth['samples']} samples"
+    )
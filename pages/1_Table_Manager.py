@@ -1,36 +1,26 @@
+import math
+
 import streamlit as st
-import sqlite3
 import pandas as pd
-from utils import DB_FILE, quote_ident, get_table_names, get_table_columns, insert_row, init_session_state, require_login, is_admin, show_logo
-
-# Add custom CSS for title fonts
-st.markdown("""
-<style>
-h1, h2, h3, h4, h5, h6 {
-    font-family: 'CormorantGaramond', serif !important;
-    font-weight: 500 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+from utils import ROWID_COLUMN, get_table_names, get_table_columns, insert_row, init_session_state, require_login, is_admin, read_connection, diff_frames, save_changeset, count_table_rows, fetch_table_window, get_column_values, put_snapshot, get_snapshot, drop_snapshots, editor_has_edits
 
 init_session_state()
 require_login()
 
 st.title("📊 Table Viewer & Data Entry")
-show_logo()
-# --- Connect to DB ---
-conn = sqlite3.connect(DB_FILE)
+
+PAGE_SIZES = [100, 250, 500, 1000]
 
 def update_table_state():
     st.session_state.selected_table = st.session_state["table_selected"]
 
 # --- Sidebar: Table selection ---
-all_tables = get_table_names(conn)
+with read_connection() as conn:
+    all_tables = get_table_names(conn)
 tables = [t for t in all_tables if t.lower() != "users"]
 
 if not tables:
     st.warning("No tables found in the database.")
-    conn.close()
     st.stop()
 
 # Compute default index without mutating session_state before widget render
@@ -49,44 +39,117 @@ selected_table = st.selectbox(
 if selected_table != prior_table:
     st.session_state.selected_table = selected_table
     # Clear any stored original dataframes when switching tables
-    for key in list(st.session_state.keys()):
-        if key.startswith("original_df_"):
-            del st.session_state[key]
+    drop_snapshots("original_df_")
 
 # --- Show table data ---
-df = pd.read_sql(f"SELECT * FROM {quote_ident(selected_table)}", conn)
+with read_connection() as conn:
+    columns_info = get_table_columns(conn, selected_table)
+column_names = columns_info["name"].tolist()
 st.subheader(f"Data in “{selected_table}”")
 
-# Store original dataframe in session state for reset functionality
-original_df_key = f"original_df_{selected_table}"
-if original_df_key not in st.session_state:
-    st.session_state[original_df_key] = df.copy()
+# Window controls: sorting and filtering run in SQLite, only one page of rows is loaded
+w1, w2, w3, w4, w5 = st.columns([2, 1, 2, 2, 1])
+with w1:
+    sort_choice = st.selectbox("Sort by", ["(table order)"] + column_names, key=f"sort_{selected_table}")
+with w2:
+    descending = st.toggle("Descending", key=f"desc_{selected_table}")
+with w3:
+    filter_choice = st.selectbox("Filter column", ["(no filter)"] + column_names, key=f"filter_col_{selected_table}")
+with w4:
+    filter_text = st.text_input("Contains", key=f"filter_text_{selected_table}")
+with w5:
+    chunk_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"chunk_{selected_table}")
+
+sort_by = sort_choice if sort_choice in column_names else None
+filter_column = filter_choice if filter_choice in column_names else None
+window_id = f"{selected_table}|{sort_by}|{descending}|{filter_column}|{filter_text}|{chunk_size}"
+
+# The window is shown one page at a time; each page has its own snapshot and editor
+total_rows = count_table_rows(selected_table, filter_column, filter_text)
+page_count = max(1, math.ceil(total_rows / chunk_size))
+page_key = f"window_page_{window_id}"
+if st.session_state.get(page_key, 1) > page_count:
+    st.session_state[page_key] = page_count
+page = int(st.session_state.get(page_key, 1))
+original_df_key = f"original_df_{window_id}|p{page}"
+editor_key = f"editor_{window_id}|p{page}"
 
-# Display editable dataframe
+# Forget paging and editor state left behind by other windows and pages; page
+# changes are blocked while there are edits, so only the current editor can hold any
+stale_keys = [
+    k for k in st.session_state.keys()
+    if isinstance(k, str)
+    and ((k.startswith("window_page_") and k != page_key) or (k.startswith("editor_") and k != editor_key))
+]
+for k in stale_keys:
+    del st.session_state[k]
+if st.session_state.get("table_window_id") != window_id:
+    st.session_state["table_window_id"] = window_id
+    drop_snapshots("original_df_")
+
+pending_edits = editor_has_edits(st.session_state.get(editor_key))
+
+p1, p2 = st.columns([1, 4])
+with p1:
+    page = int(st.number_input(
+        f"Page (of {page_count})",
+        min_value=1,
+        max_value=page_count,
+        step=1,
+        key=page_key,
+        disabled=pending_edits,
+        help="Save or discard changes before changing page" if pending_edits else None,
+    ))
+# The page may have changed in this run
+original_df_key = f"original_df_{window_id}|p{page}"
+editor_key = f"editor_{window_id}|p{page}"
+
+# Snapshot of the page, used both as the editor's data and as the diff baseline.
+# Snapshots live in a budgeted store and may be evicted; they are then re-fetched.
+original_df = get_snapshot(original_df_key)
+if original_df is None:
+    # The editor's pending edits are row positions in the lost snapshot; applied
+    # to a fresh fetch they could land on different rows, so they are dropped
+    if editor_has_edits(st.session_state.get(editor_key)):
+        del st.session_state[editor_key]
+        st.warning("⚠️ Your unsaved edits on this page expired and were discarded. The page was reloaded from the database.")
+    original_df = fetch_table_window(
+        selected_table,
+        limit=chunk_size,
+        offset=(page - 1) * chunk_size,
+        sort_by=sort_by,
+        descending=descending,
+        filter_column=filter_column,
+        filter_text=filter_text,
+    )
+    put_snapshot(original_df_key, original_df)
+
+# Display editable dataframe; the rowid column identifies rows but stays hidden
 edited_df = st.data_editor(
-    df,
+    original_df,
     num_rows="dynamic",
     use_container_width=True,
-    key=f"editor_{selected_table}"
+    column_config={ROWID_COLUMN: None},
+    key=editor_key
 )
 
-# Check if data was modified
-original_df = st.session_state[original_df_key]
-if not original_df.equals(edited_df):
-    # Count changes
-    update_count = 0
-    insert_count = 0
-    
-    # Count updates
-    for index, row in edited_df.iterrows():
-        if index < len(original_df):
-            original_row = original_df.iloc[index]
-            if not row.equals(original_row):
-                update_count += 1
-    
-    # Count inserts
-    if len(edited_df) > len(original_df):
-        insert_count = len(edited_df) - len(original_df)
+# Check if data was modified (one vectorized diff shared by the summary, save and preview)
+changeset = diff_frames(original_df, edited_df, key=ROWID_COLUMN)
+has_changes = bool(changeset["updated"] or changeset["deleted"] or not changeset["inserted"].empty)
+
+l1, l2 = st.columns([4, 1])
+with l1:
+    first_row = (page - 1) * chunk_size
+    st.caption(f"Showing rows {first_row + 1}-{first_row + len(original_df)} of {total_rows}")
+with l2:
+    if st.button("🔄 Reload", disabled=has_changes):
+        drop_snapshots(original_df_key)
+        st.rerun()
+
+if has_changes:
+    update_count = len(changeset["updated"])
+    insert_count = len(changeset["inserted"])
+    delete_count = len(changeset["deleted"])
     
     # Show change summary
     change_summary = []
@@ -94,6 +157,8 @@ if not original_df.equals(edited_df):
         change_summary.append(f"{update_count} row(s) to update")
     if insert_count > 0:
         change_summary.append(f"{insert_count} new row(s) to add")
+    if delete_count > 0:
+        change_summary.append(f"{delete_count} row(s) to delete")
     
     st.info(f"⚠️ Data has been modified: {', '.join(change_summary)}. Click 'Save Changes' to update the database.")
     
@@ -103,88 +168,29 @@ if not original_df.equals(edited_df):
     with col1:
         if st.button("💾 Save Changes", type="primary"):
             try:
-                cursor = conn.cursor()
-                
-                # Handle updates to existing rows
-                for index, row in edited_df.iterrows():
-                    if index < len(original_df):
-                        # Check if this row was modified
-                        original_row = original_df.iloc[index]
-                        if not row.equals(original_row):
-                            # Build UPDATE query
-                            set_clause = ", ".join([
-                                f"{quote_ident(col)} = ?" 
-                                for col in edited_df.columns 
-                                if col in df.columns
-                            ])
-                            
-                            # Get primary key column
-                            pk_info = get_table_columns(conn, selected_table)
-                            pk_column = pk_info[pk_info['pk'] == 1]['name'].iloc[0] if any(pk_info['pk'] == 1) else edited_df.columns[0]
-                            
-                            # Build WHERE clause using primary key
-                            where_clause = f"{quote_ident(pk_column)} = ?"
-                            
-                            # Prepare values for SET clause
-                            set_values = [row[col] for col in edited_df.columns if col in df.columns]
-                            
-                            # Prepare value for WHERE clause
-                            where_value = row[pk_column] if pk_column in row else row[edited_df.columns[0]]
-                            
-                            # Execute UPDATE
-                            query = f"UPDATE {quote_ident(selected_table)} SET {set_clause} WHERE {where_clause}"
-                            cursor.execute(query, set_values + [where_value])
+                save_changeset(selected_table, edited_df, changeset)
                 
-                # Handle new rows (INSERT)
-                if len(edited_df) > len(original_df):
-                    # Get column information for INSERT
-                    columns_info = get_table_columns(conn, selected_table)
-                    pk_column = columns_info[columns_info['pk'] == 1]['name'].iloc[0] if any(columns_info['pk'] == 1) else None
-                    
-                    # Get new rows (rows beyond the original dataframe length)
-                    new_rows = edited_df.iloc[len(original_df):]
-                    
-                    for _, row in new_rows.iterrows():
-                        # Skip if primary key is None or empty
-                        if pk_column and (pd.isna(row[pk_column]) or row[pk_column] == ""):
-                            continue
-                        
-                        # Build INSERT query
-                        columns = [col for col in edited_df.columns if col in df.columns]
-                        placeholders = ", ".join(["?" for _ in columns])
-                        columns_str = ", ".join([quote_ident(col) for col in columns])
-                        
-                        # Prepare values for INSERT
-                        values = [row[col] for col in columns]
-                        
-                        # Execute INSERT
-                        query = f"INSERT INTO {quote_ident(selected_table)} ({columns_str}) VALUES ({placeholders})"
-                        cursor.execute(query, values)
-                
-                # Commit changes
-                conn.commit()
                 st.success("✅ Changes saved successfully!")
                 
-                # Update the original dataframe in session state to reflect the new state
-                st.session_state[original_df_key] = edited_df.copy()
-                
-                # Refresh the dataframe
-                df = pd.read_sql(f"SELECT * FROM {quote_ident(selected_table)}", conn)
-                st.rerun()
-                
+                # Reload editor and snapshot from the database so new rows get their rowids
+                drop_snapshots(original_df_key)
+                if editor_key in st.session_state:
+                    del st.session_state[editor_key]
+                saved = True
             except Exception as e:
                 st.error(f"❌ Error saving changes: {e}")
-                conn.rollback()
+                saved = False
+            if saved:
+                st.rerun()
     
     with col2:
         if st.button("🗑️ Discard Changes"):
             # Reset the data editor to original state
-            editor_key = f"editor_{selected_table}"
             if editor_key in st.session_state:
                 del st.session_state[editor_key]
             
-            # Reset the original dataframe to current database state
-            st.session_state[original_df_key] = df.copy()
+            # Reload the window from the current database state
+            drop_snapshots(original_df_key)
             
             st.info("🔄 Changes discarded. Data reset to original state.")
             st.rerun()
@@ -193,24 +199,33 @@ if not original_df.equals(edited_df):
     st.subheader("📊 Changes Preview")
     st.write("**Modified rows:**")
     
-    # Find modified rows
-    for index, row in edited_df.iterrows():
-        if index < len(original_df):
-            original_row = original_df.iloc[index]
-            if not row.equals(original_row):
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"**Row {index + 1} - Original:**")
-                    st.dataframe(pd.DataFrame([original_row]).T, use_container_width=True)
-                with col2:
-                    st.write(f"**Row {index + 1} - Modified:**")
-                    st.dataframe(pd.DataFrame([row]).T, use_container_width=True)
-                st.markdown("---")
+    # Show modified rows from the changeset
+    original_by_rowid = original_df.set_index(ROWID_COLUMN)
+    edited_by_rowid = edited_df.dropna(subset=[ROWID_COLUMN]).set_index(ROWID_COLUMN)
+    for rowid, changed_cols in changeset["updated"].items():
+        original_row = original_by_rowid.loc[rowid]
+        row = edited_by_rowid.loc[rowid]
+        st.caption(f"Changed columns: {', '.join(changed_cols)}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**Row {rowid} - Original:**")
+            st.dataframe(pd.DataFrame([original_row]).T, use_container_width=True)
+        with col2:
+            st.write(f"**Row {rowid} - Modified:**")
+            st.dataframe(pd.DataFrame([row]).T, use_container_width=True)
+        st.markdown("---")
+    
+    if changeset["deleted"]:
+        st.write("**Deleted rows:**")
+        st.dataframe(
+            original_by_rowid.loc[changeset["deleted"]],
+            use_container_width=True,
+            hide_index=True
+        )
 
 if is_admin():
     # --- Data Entry Form ---
     st.subheader("Add New Record")
-    columns_info = get_table_columns(conn, selected_table)
 
     form_data = {}
     with st.form("data_entry_form"):
@@ -228,9 +243,9 @@ if is_admin():
                     value = st.date_input(col_name)
             elif "partner type" in col_name.lower() or "standard_type" in col_name.lower():
                 try:
-                    existing_values = df[col_name].dropna().unique()
+                    existing_values = get_column_values(selected_table, col_name)
                     if len(existing_values) > 0:
-                        options = ["Select..."] + sorted(existing_values.tolist())
+                        options = ["Select..."] + existing_values
                         value = st.selectbox(col_name, options, index=0)
                         if value == "Select...":
                             value = None
@@ -240,9 +255,9 @@ if is_admin():
                     value = st.text_input(col_name)
             elif "country" in col_name.lower():
                 try:
-                    existing_values = df[col_name].dropna().unique()
+                    existing_values = get_column_values(selected_table, col_name)
                     if len(existing_values) > 0:
-                        options = ["Select..."] + sorted(existing_values.tolist())
+                        options = ["Select..."] + existing_values
                         value = st.selectbox(col_name, options, index=0)
                         if value == "Select...":
                             value = None
@@ -252,9 +267,9 @@ if is_admin():
                     value = st.text_input(col_name)
             elif "region" in col_name.lower() or "location" in col_name.lower():
                 try:
-                    existing_values = df[col_name].dropna().unique()
+                    existing_values = get_column_values(selected_table, col_name)
                     if len(existing_values) > 0:
-                        options = ["Select..."] + sorted(existing_values.tolist())
+                        options = ["Select..."] + existing_values
                         value = st.selectbox(col_name, options, index=0)
                         if value == "Select...":
                             value = None
@@ -293,14 +308,10 @@ if is_admin():
                 k: (v if not (isinstance(v, str) and v == "") else None)
                 for k, v in form_data.items()
             }
-            insert_row(conn, selected_table, cleaned)
+            insert_row(selected_table, cleaned)
             st.success(f"Record added to “{selected_table}” successfully!")
-            # Refresh the dataframe after adding new record
-            df = pd.read_sql(f"SELECT * FROM {quote_ident(selected_table)}", conn)
             st.rerun()
         except Exception as e:
             st.error(f"Error adding record: {e}")
 else:
-    st.info("You have viewer access. Only admins can add records.")
-
-conn.close()
\ No newline at end of file
+    st.info("You have viewer access. Only admins can add records.")
\ No newline at end of file
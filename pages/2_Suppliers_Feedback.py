@@ -1,111 +1,93 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-from utils import DB_FILE, quote_ident, init_session_state, require_login, show_logo
-
-# Add custom CSS for title fonts
-st.markdown("""
-<style>
-h1, h2, h3, h4, h5, h6 {
-    font-family: 'CormorantGaramond', serif !important;
-    font-weight: 500 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+from utils import init_session_state, require_login, read_connection, get_table_columns, get_column_values, get_partner_names, get_partner_details, get_partner_feedback, feedback_badge_html, FEEDBACK_STYLES, get_facet_index, facet_options, facet_label
 
 init_session_state()
 require_login()
 
 st.title("💬 Suppliers Feedback")
-show_logo()
 table_name = "Feedback Database"
-conn = sqlite3.connect(DB_FILE)
 
 def update_state():
     st.session_state.selected_supplier = st.session_state["supplier_selected"]
 
 try:
-    df_feedback = pd.read_sql(f"SELECT * FROM {quote_ident(table_name)}", conn)
+    # Lookups below run as indexed SQL queries instead of scanning whole tables
+    with read_connection() as conn:
+        feedback_columns = get_table_columns(conn, table_name)["name"].tolist()
 
-    if "Partner Name" not in df_feedback.columns:
+    if "Partner Name" not in feedback_columns:
         st.error(f"Column 'Partner Name' not found in table '{table_name}'.")
     else:
         # Build stable options
-        suppliers = (
-            df_feedback["Partner Name"]
-            .dropna()
-            .astype(str)
-            .unique()
-            .tolist()
-        )
+        suppliers = [str(name) for name in get_column_values(table_name, "Partner Name")]
         suppliers.sort()
 
-        # Add filters for Partner Type, Country, and Region BEFORE supplier selection
+        # Add filters for Partner Type, Country, and Location BEFORE supplier selection
         st.markdown("---")
         st.subheader("🔍 Filter Suppliers")
         
-        # Connect to Main Travel Database to get partner details for filtering
+        # Use Main Travel Database partner details for filtering; options and
+        # counts come from the shared facet index. Country is the parent of
+        # Location, so it is not narrowed by the Location choice.
         try:
-            main_conn = sqlite3.connect(DB_FILE)
-            df_main = pd.read_sql(f"SELECT * FROM {quote_ident('Main Travel Database')}", main_conn)
+            facets = get_facet_index("Main Travel Database", ["Partner Type", "Country", "Location"])
+            all_labels = {"Partner Type": "All Types", "Country": "All Countries", "Location": "All Locations"}
+            facet_keys = {"Partner Type": "partner_type_filter", "Country": "country_filter", "Location": "location_filter"}
+            current = {}
+            for facet, key in facet_keys.items():
+                value = st.session_state.get(key, all_labels[facet])
+                current[facet] = None if value == all_labels[facet] else value
             
-            # Partner Type filter
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                if "Partner Type" in df_main.columns:
-                    partner_types = ["All Types"] + sorted(df_main["Partner Type"].dropna().unique().tolist())
-                    selected_partner_type = st.selectbox("Filter by Partner Type:", partner_types, key="partner_type_filter")
+                if "Partner Type" in facets["columns"]:
+                    type_counts = facet_options(facets, "Partner Type", current)
+                    partner_types = ["All Types"] + list(type_counts)
+                    selected_partner_type = st.selectbox("Filter by Partner Type:", partner_types, format_func=facet_label(type_counts), key="partner_type_filter")
                 else:
                     selected_partner_type = "All Types"
+                current["Partner Type"] = None if selected_partner_type == "All Types" else selected_partner_type
             
             with col2:
-                if "Country" in df_main.columns:
-                    countries = ["All Countries"] + sorted(df_main["Country"].dropna().unique().tolist())
-                    selected_country = st.selectbox("Filter by Country:", countries, key="country_filter")
+                if "Country" in facets["columns"]:
+                    country_counts = facet_options(facets, "Country", {**current, "Location": None})
+                    countries = ["All Countries"] + list(country_counts)
+                    selected_country = st.selectbox("Filter by Country:", countries, format_func=facet_label(country_counts), key="country_filter")
                 else:
                     selected_country = "All Countries"
+                current["Country"] = None if selected_country == "All Countries" else selected_country
             
             with col3:
-                if "Region" in df_main.columns:
-                    # Filter regions based on selected country
-                    if selected_country != "All Countries":
-                        country_regions = df_main[df_main["Country"] == selected_country]["Region"].dropna().unique()
-                        regions = ["All Regions"] + sorted(country_regions.tolist())
-                    else:
-                        regions = ["All Regions"] + sorted(df_main["Region"].dropna().unique().tolist())
-                    
-                    selected_region = st.selectbox("Filter by Region:", regions, key="region_filter")
+                if "Location" in facets["columns"]:
+                    location_counts = facet_options(facets, "Location", current)
+                    locations = ["All Locations"] + list(location_counts)
+                    selected_location = st.selectbox("Filter by Location:", locations, format_func=facet_label(location_counts), key="location_filter")
                 else:
-                    selected_region = "All Regions"
+                    selected_location = "All Locations"
             
             # Filter suppliers based on selected criteria
-            if selected_partner_type != "All Types" or selected_country != "All Countries" or selected_region != "All Regions":
-                # Create filter mask for Main Travel Database
-                main_mask = pd.Series([True] * len(df_main))  # Start with all True
-                
+            if selected_partner_type != "All Types" or selected_country != "All Countries" or selected_location != "All Locations":
+                partner_filters = {}
                 if selected_partner_type != "All Types":
-                    main_mask &= df_main["Partner Type"] == selected_partner_type
-                
+                    partner_filters["Partner Type"] = selected_partner_type
                 if selected_country != "All Countries":
-                    main_mask &= df_main["Country"] == selected_country
-                
-                if selected_region != "All Regions":
-                    main_mask &= df_main["Region"] == selected_region
+                    partner_filters["Country"] = selected_country
+                if selected_location != "All Locations":
+                    partner_filters["Location"] = selected_location
                 
                 # Get filtered partner names
-                filtered_partners = df_main[main_mask]["Partner Name"].unique()
+                filtered_partners = set(get_partner_names(partner_filters))
                 
                 # Filter suppliers to only show those that match the criteria AND have feedback
                 suppliers = [s for s in suppliers if s in filtered_partners]
             
-            main_conn.close()
-            
         except Exception as e:
             st.warning(f"⚠️ Could not load partner details for filtering: {e}")
             selected_partner_type = "All Types"
             selected_country = "All Countries"
-            selected_region = "All Regions"
+            selected_location = "All Locations"
 
         st.markdown("---")
         # st.subheader("👥 Select Supplier")
@@ -122,31 +104,29 @@ try:
             st.session_state.selected_supplier = supplier_selected
 
         # Show filtered data in Streamlit native format
-        df_filtered = df_feedback[df_feedback["Partner Name"].astype(str) == supplier_selected]
+        # Feedback comes back sorted by its precomputed priority: good, neutral, bad
+        df_filtered = get_partner_feedback(supplier_selected) if supplier_selected is not None else pd.DataFrame()
         
         if not df_filtered.empty:
             # Get supplier details from Main Travel Database
             try:
-                main_conn = sqlite3.connect(DB_FILE)
-                df_main = pd.read_sql(f"SELECT * FROM {quote_ident('Main Travel Database')}", main_conn)
-                
                 # Get supplier details
-                supplier_details = df_main[df_main["Partner Name"] == supplier_selected]
+                supplier_details = get_partner_details(supplier_selected)
                 
-                if not supplier_details.empty:
+                if supplier_details is not None:
                     # Display supplier information
                     with st.expander("🏢 Supplier Information", expanded=False):
                         # Row 1: Standard Type + Country
                         r1c1, r1c2 = st.columns(2)
                         with r1c1:
                             st.markdown("**Standard Type:**")
-                            standard_type = supplier_details.iloc[0].get("Standard_Type", "Not specified")
+                            standard_type = supplier_details.get("Standard_Type", "Not specified")
                             if standard_type is None:
                                 standard_type = "Not specified"
                             st.info(standard_type)
                         with r1c2:
                             st.markdown("**Country:**")
-                            country = supplier_details.iloc[0].get("Country", "Not specified")
+                            country = supplier_details.get("Country", "Not specified")
                             if country is None:
                                 country = "Not specified"
                             st.success(country)
@@ -155,46 +135,27 @@ try:
                         r2c1, r2c2 = st.columns(2)
                         with r2c1:
                             st.markdown("**Location:**")
-                            location = supplier_details.iloc[0].get("Location", "Not specified")
+                            location = supplier_details.get("Location", "Not specified")
                             if location is None:
                                 location = "Not specified"
                             st.success(location)
                         with r2c2:
                             st.markdown("**Partner Type:**")
-                            partner_type = supplier_details.iloc[0].get("Partner Type", "Not specified")
+                            partner_type = supplier_details.get("Partner Type", "Not specified")
                             if partner_type is None:
                                 partner_type = "Not specified"
                             st.info(partner_type)
 
                         # Row 3: Full-width Description
                         st.markdown("**Description:**")
-                        description_full = supplier_details.iloc[0].get("Description", "No description available")
+                        description_full = supplier_details.get("Description", "No description available")
                         if description_full is None:
                             description_full = "No description available"
                         st.info(str(description_full))
                     
-                    main_conn.close()
-                    
             except Exception as e:
                 st.warning(f"⚠️ Could not load supplier details: {e}")
             
-            # Sort feedback by priority: good first, then neutral, then bad
-            def get_feedback_priority(feedback_type):
-                feedback_lower = str(feedback_type).lower()
-                if any(word in feedback_lower for word in ["positive", "good", "excellent", "great", "outstanding"]):
-                    return 1  # Highest priority (good)
-                elif any(word in feedback_lower for word in ["neutral", "suggestion", "improvement", "general"]):
-                    return 2  # Medium priority (neutral)
-                elif any(word in feedback_lower for word in ["negative", "bad", "poor", "complaint", "issue"]):
-                    return 3  # Lowest priority (bad)
-                else:
-                    return 2  # Default to neutral priority
-            
-            # Sort the dataframe by priority
-            df_filtered = df_filtered.copy()
-            df_filtered['priority'] = df_filtered['Feedback Type'].apply(get_feedback_priority)
-            df_filtered = df_filtered.sort_values('priority')
-            
             # Show total count below dropdown in a nice container
             with st.container(border=True):
                 # Create a nice summary section using Streamlit components
@@ -248,26 +209,12 @@ try:
                     # Truncate feedback message for title if too long
                     feedback_preview = feedback_msg[:50] + "..." if len(feedback_msg) > 50 else feedback_msg
                     
-                    # Determine symbol for feedback type
-                    if "positive" in feedback_type.lower() or "good" in feedback_type.lower() or "excellent" in feedback_type.lower():
-                        feedback_symbol = "✅"
-                    elif "negative" in feedback_type.lower() or "bad" in feedback_type.lower() or "poor" in feedback_type.lower() or "complaint" in feedback_type.lower():
-                        feedback_symbol = "❌"
-                    elif "neutral" in feedback_type.lower() or "suggestion" in feedback_type.lower() or "improvement" in feedback_type.lower():
-                        feedback_symbol = "💡"
-                    else:
-                        feedback_symbol = "📝"
+                    # Symbol and badge come from the precomputed sentiment
+                    feedback_symbol = FEEDBACK_STYLES.get(row["sentiment"], FEEDBACK_STYLES["other"])[0]
                     
                     with st.expander(f"{feedback_symbol} {feedback_type} | {feedback_preview}", expanded=False):
                         # Feedback type badge with better styling
-                        if "positive" in feedback_type.lower() or "good" in feedback_type.lower() or "excellent" in feedback_type.lower():
-                            st.markdown(f"<div style='background-color: #d4edda; color: #155724; padding: 8px 12px; border-radius: 6px; border: 1px solid #c3e6cb; font-weight: bold;'>✅ {feedback_type}</div>", unsafe_allow_html=True)
-                        elif "negative" in feedback_type.lower() or "bad" in feedback_type.lower() or "poor" in feedback_type.lower() or "complaint" in feedback_type.lower():
-                            st.markdown(f"<div style='background-color: #f8d7da; color: #721c24; padding: 8px 12px; border-radius: 6px; border: 1px solid #f5c6cb; font-weight: bold;'>❌ {feedback_type}</div>", unsafe_allow_html=True)
-                        elif "neutral" in feedback_type.lower() or "suggestion" in feedback_type.lower() or "improvement" in feedback_type.lower():
-                            st.markdown(f"<div style='background-color: #fff3cd; color: #856404; padding: 8px 12px; border-radius: 6px; border: 1px solid #ffeaa7; font-weight: bold;'>💡 {feedback_type}</div>", unsafe_allow_html=True)
-                        else:
-                            st.markdown(f"<div style='background-color: #e2e3e5; color: #383d41; padding: 8px 12px; border-radius: 6px; border: 1px solid #d6d8db; font-weight: bold;'>📝 {feedback_type}</div>", unsafe_allow_html=True)
+                        st.markdown(feedback_badge_html(row["sentiment"], feedback_type), unsafe_allow_html=True)
                         
                         st.markdown("")
                         
@@ -284,7 +231,5 @@ try:
 
 except Exception as e:
     st.error(f"Error loading suppliers feedback: {e}")
-finally:
-    conn.close()
 
     
\ No newline at end of file
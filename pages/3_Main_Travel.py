@@ -1,28 +1,16 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-from utils import DB_FILE, quote_ident, init_session_state, require_login, show_logo
-
-# Add custom CSS for title fonts
-st.markdown("""
-<style>
-h1, h2, h3, h4, h5, h6 {
-    font-family: 'CormorantGaramond', serif !important;
-    font-weight: 500 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+from utils import init_session_state, require_login, load_table, get_facet_index, facet_options, facet_label, get_feedback_by_partner, feedback_badge_html, search_partners, count_partners
 
 init_session_state()
 require_login()
 
 st.title("✈️ Main Travel Database")
-show_logo()
 table_name = "Main Travel Database"
-conn = sqlite3.connect(DB_FILE)
+PAGE_SIZES = [10, 25, 50, 100]
 
 try:
-    df_main = pd.read_sql(f"SELECT * FROM {quote_ident(table_name)}", conn)
+    df_main = load_table(table_name)
 
     if "Partner Name" not in df_main.columns:
         st.error(f"Column 'Partner Name' not found in table '{table_name}'.")
@@ -30,36 +18,45 @@ try:
         # Search functionality
         st.subheader("🔍 Search Partners")
         
-        # Filters for Country, Location, and Status
+        # Filters for Country, Location, and Status; each dropdown lists only the
+        # values (with counts) that match the other selections. Country is the
+        # parent of Location, so it is not narrowed by the Location choice.
+        facets = get_facet_index(table_name, ["Country", "Location", "Status"])
+        all_labels = {"Country": "All Countries", "Location": "All Locations", "Status": "All Statuses"}
+        facet_keys = {"Country": "country_filter", "Location": "location_filter", "Status": "status_filter"}
+        current = {}
+        for facet, key in facet_keys.items():
+            value = st.session_state.get(key, all_labels[facet])
+            current[facet] = None if value == all_labels[facet] else value
+        
         col1, col2, col3 = st.columns(3)
         
         with col1:
             # Country filter
             if "Country" in df_main.columns:
-                countries = ["All Countries"] + sorted(df_main["Country"].dropna().unique().tolist())
-                selected_country = st.selectbox("Filter by Country:", countries, key="country_filter")
+                country_counts = facet_options(facets, "Country", {**current, "Location": None})
+                countries = ["All Countries"] + list(country_counts)
+                selected_country = st.selectbox("Filter by Country:", countries, format_func=facet_label(country_counts), key="country_filter")
             else:
                 selected_country = "All Countries"
+            current["Country"] = None if selected_country == "All Countries" else selected_country
         
         with col2:
             # Location filter
             if "Location" in df_main.columns:
-                # Filter locations based on selected country
-                if selected_country != "All Countries":
-                    country_locations = df_main[df_main["Country"] == selected_country]["Location"].dropna().unique()
-                    locations = ["All Locations"] + sorted(country_locations.tolist())
-                else:
-                    locations = ["All Locations"] + sorted(df_main["Location"].dropna().unique().tolist())
-                
-                selected_location = st.selectbox("Filter by Location:", locations, key="location_filter")
+                location_counts = facet_options(facets, "Location", current)
+                locations = ["All Locations"] + list(location_counts)
+                selected_location = st.selectbox("Filter by Location:", locations, format_func=facet_label(location_counts), key="location_filter")
             else:
                 selected_location = "All Locations"
+            current["Location"] = None if selected_location == "All Locations" else selected_location
         
         with col3:
             # Status filter
             if "Status" in df_main.columns:
-                statuses = ["All Statuses"] + sorted(df_main["Status"].dropna().unique().tolist())
-                selected_status = st.selectbox("Filter by Status:", statuses, key="status_filter")
+                status_counts = facet_options(facets, "Status", current)
+                statuses = ["All Statuses"] + list(status_counts)
+                selected_status = st.selectbox("Filter by Status:", statuses, format_func=facet_label(status_counts), key="status_filter")
             else:
                 selected_status = "All Statuses"
         
@@ -73,55 +70,24 @@ try:
         )
         
         if search_keyword or selected_country != "All Countries" or selected_location != "All Locations" or selected_status != "All Statuses":
-            # Apply filters
-            df_filtered = df_main.copy()
-            
-            # Apply country filter
+            # Exact-value filters and the keyword search run in SQLite; keyword
+            # matches come back ranked by relevance
+            search_filters = {}
             if selected_country != "All Countries":
-                df_filtered = df_filtered[df_filtered["Country"] == selected_country].reset_index(drop=True)
-            
-            # Apply location filter
+                search_filters["Country"] = selected_country
             if selected_location != "All Locations":
-                df_filtered = df_filtered[df_filtered["Location"] == selected_location].reset_index(drop=True)
-            
-            # Apply status filter
+                search_filters["Location"] = selected_location
             if selected_status != "All Statuses":
-                df_filtered = df_filtered[df_filtered["Status"] == selected_status].reset_index(drop=True)
+                search_filters["Status"] = selected_status
             
-            # Apply search keyword filter
-            if search_keyword:
-                # Search across multiple columns
-                search_columns = ["Partner Name", "Description", "Location", "Country"]
-                available_columns = [col for col in search_columns if col in df_filtered.columns]
-                
-                if available_columns:
-                    # Create search mask across all available columns
-                    search_mask = pd.Series([False] * len(df_filtered), index=df_filtered.index)
-                    for col in available_columns:
-                        col_mask = df_filtered[col].astype(str).str.contains(
-                            search_keyword, 
-                            case=False, 
-                            na=False
-                        )
-                        search_mask |= col_mask
-                    
-                    df_filtered = df_filtered[search_mask].reset_index(drop=True)
-                else:
-                    # Fallback to Partner Name only if other columns don't exist
-                    mask = df_filtered["Partner Name"].astype(str).str.contains(
-                        search_keyword, 
-                        case=False, 
-                        na=False
-                    )
-                    df_filtered = df_filtered[mask].reset_index(drop=True)
+            total_matches, unique_partners = count_partners(search_keyword, search_filters)
             
-            if not df_filtered.empty:
+            if total_matches > 0:
                 # Show search results summary in one line
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    st.metric("Total Matches", len(df_filtered))
+                    st.metric("Total Matches", total_matches)
                 with col2:
-                    unique_partners = df_filtered["Partner Name"].nunique()
                     st.metric("Unique Partners", unique_partners)
                 with col3:
                     # Count active filters
@@ -156,16 +122,55 @@ try:
                     filter_summary = " | ".join(active_filters)
                     st.caption(f"**Filters applied:** {filter_summary}")
                 
-                # Display filtered results
-                for idx, row in df_filtered.iterrows():
+                # Pagination: only the current page is fetched and rendered
+                pcol1, pcol2 = st.columns([1, 1])
+                with pcol1:
+                    page_size = st.selectbox("Results per page:", PAGE_SIZES, index=1, key="partner_page_size")
+                num_pages = max(1, -(-total_matches // page_size))
+                
+                # Go back to the first page whenever the search changes
+                search_signature = (search_keyword, tuple(sorted(search_filters.items())), page_size)
+                if st.session_state.get("partner_search_signature") != search_signature:
+                    st.session_state["partner_search_signature"] = search_signature
+                    st.session_state["partner_page"] = 1
+                elif st.session_state.get("partner_page", 1) > num_pages:
+                    st.session_state["partner_page"] = num_pages
+                
+                with pcol2:
+                    page = st.number_input(
+                        f"Page (of {num_pages}):",
+                        min_value=1,
+                        max_value=num_pages,
+                        step=1,
+                        key="partner_page"
+                    )
+                
+                offset = (int(page) - 1) * page_size
+                df_filtered = search_partners(search_keyword, search_filters, limit=page_size, offset=offset)
+                st.caption(f"Showing {offset + 1}–{offset + len(df_filtered)} of {total_matches}")
+                
+                # Feedback grouped by Partner ID, shared across sessions
+                feedback_by_partner = get_feedback_by_partner()
+                
+                # Display filtered results; details are built only when toggled open
+                for rowid, row in df_filtered.iterrows():
                     partner_name = row.get("Partner Name", "Unknown Partner")
                     
-                    with st.container():
+                    with st.container(border=True):
                         # Get status for display in title
                         status = row.get("Status", "No status")
                         status_display = f" - {status}" if status and status != "No status" else ""
                         
-                        with st.expander(f"📋 {partner_name}{status_display}", expanded=False):
+                        hcol1, hcol2 = st.columns([5, 1])
+                        with hcol1:
+                            st.markdown(f"**📋 {partner_name}{status_display}**")
+                            place = " • ".join(str(v) for v in [row.get("Country"), row.get("Location")] if v)
+                            if place:
+                                st.caption(place)
+                        with hcol2:
+                            show_details = st.toggle("Details", key=f"partner_details_{rowid}")
+                        
+                        if show_details:
                             # Row 1: Country, Location, Address
                             r1c1, r1c2, r1c3 = st.columns(3)
                             with r1c1:
@@ -210,35 +215,14 @@ try:
                             partner_id = row.get("Partner ID", None)
                             if partner_id:
                                 try:
-                                    # Connect to feedback database
-                                    feedback_conn = sqlite3.connect(DB_FILE)
-                                    feedback_df = pd.read_sql(f"SELECT * FROM {quote_ident('Feedback Database')}", feedback_conn)
-                                    
-                                    # Filter feedback by Partner ID
-                                    partner_feedback = feedback_df[feedback_df["Partner ID"] == partner_id]
+                                    partner_feedback_entry = feedback_by_partner.get(partner_id)
                                     
-                                    if not partner_feedback.empty:
-                                        # Sort feedback by priority: good first, then neutral, then bad
-                                        def get_feedback_priority(feedback_type):
-                                            feedback_lower = str(feedback_type).lower()
-                                            if any(word in feedback_lower for word in ["positive", "good", "excellent", "great", "outstanding"]):
-                                                return 1  # Highest priority (good)
-                                            elif any(word in feedback_lower for word in ["neutral", "suggestion", "improvement", "general"]):
-                                                return 2  # Medium priority (neutral)
-                                            elif any(word in feedback_lower for word in ["negative", "bad", "poor", "complaint", "issue"]):
-                                                return 3  # Lowest priority (bad)
-                                            else:
-                                                return 2  # Default to neutral priority
-                                        
-                                        # Sort the feedback
-                                        partner_feedback = partner_feedback.copy()
-                                        partner_feedback['priority'] = partner_feedback['Feedback Type'].apply(get_feedback_priority)
-                                        partner_feedback = partner_feedback.sort_values('priority')
-                                        
-                                        # Count feedback by type
-                                        good_count = len(partner_feedback[partner_feedback['priority'] == 1])
-                                        neutral_count = len(partner_feedback[partner_feedback['priority'] == 2])
-                                        bad_count = len(partner_feedback[partner_feedback['priority'] == 3])
+                                    if partner_feedback_entry is not None:
+                                        # Rows are pre-sorted: good first, then neutral, then bad
+                                        partner_feedback = partner_feedback_entry["rows"]
+                                        good_count = partner_feedback_entry["good"]
+                                        neutral_count = partner_feedback_entry["neutral"]
+                                        bad_count = partner_feedback_entry["bad"]
                                         
                                         st.markdown("---")
                                         st.markdown(f"**💬 Feedback ({len(partner_feedback)} entries) - ✅ Good: {good_count} | 💡 Neutral: {neutral_count} | ❌ Bad: {bad_count}**")
@@ -251,14 +235,7 @@ try:
                                             
                                             with st.container(border=True):
                                                 # Feedback type badge with better styling
-                                                if "positive" in str(feedback_type).lower() or "good" in str(feedback_type).lower() or "excellent" in str(feedback_type).lower():
-                                                    st.markdown(f"<div style='background-color: #d4edda; color: #155724; padding: 8px 12px; border-radius: 6px; border: 1px solid #c3e6cb; font-weight: bold;'>✅ {feedback_type}</div>", unsafe_allow_html=True)
-                                                elif "negative" in str(feedback_type).lower() or "bad" in str(feedback_type).lower() or "poor" in str(feedback_type).lower() or "complaint" in str(feedback_type).lower():
-                                                    st.markdown(f"<div style='background-color: #f8d7da; color: #721c24; padding: 8px 12px; border-radius: 6px; border: 1px solid #f5c6cb; font-weight: bold;'>❌ {feedback_type}</div>", unsafe_allow_html=True)
-                                                elif "neutral" in str(feedback_type).lower() or "suggestion" in str(feedback_type).lower() or "improvement" in str(feedback_type).lower():
-                                                    st.markdown(f"<div style='background-color: #fff3cd; color: #856404; padding: 8px 12px; border-radius: 6px; border: 1px solid #ffeaa7; font-weight: bold;'>💡 {feedback_type}</div>", unsafe_allow_html=True)
-                                                else:
-                                                    st.markdown(f"<div style='background-color: #e2e3e5; color: #383d41; padding: 8px 12px; border-radius: 6px; border: 1px solid #d6d8db; font-weight: bold;'>📝 {feedback_type}</div>", unsafe_allow_html=True)
+                                                st.markdown(feedback_badge_html(feedback_row["sentiment"], feedback_type), unsafe_allow_html=True)
                                                 
                                                 st.markdown("")
                                                 
@@ -268,8 +245,6 @@ try:
                                                 # Action taken
                                                 st.markdown("**✅ Action Taken:**")
                                                 st.success(what_was_done)
-                                        
-                                        feedback_conn.close()
                                     else:
                                         st.info("💬 No feedback found for this partner")
                                         
@@ -305,5 +280,3 @@ try:
 
 except Exception as e:
     st.error(f"Error loading main travel database: {e}")
-finally:
-    conn.close()
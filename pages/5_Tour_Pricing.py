@@ -0,0 +1,110 @@
+import streamlit as st
+import pandas as pd
+from utils import init_session_state, require_login, facet_options, facet_label
+from tour_pricing import PRICING_METHODS, get_price_matrix, get_tour_facets, find_tours, quote, quote_grid, tour_label
+
+init_session_state()
+require_login()
+
+st.title("💲 Tour Pricing")
+
+METHOD_LABELS = {
+    "tier": "Nearest tier below (conservative)",
+    "linear": "Interpolate between tiers",
+}
+
+try:
+    # Tours x pax tiers, cached until the tour table changes
+    matrix = get_price_matrix()
+    tours = matrix["tours"]
+
+    if tours.empty:
+        st.info("No tours found in the tour database.")
+    else:
+        st.subheader("🔎 Filter Tours")
+        facets = get_tour_facets()
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            country_counts = facet_options(facets, "Country", {})
+            selected_country = st.selectbox(
+                "Country:", ["All Countries"] + list(country_counts), format_func=facet_label(country_counts), key="pricing_country"
+            )
+            country = None if selected_country == "All Countries" else selected_country
+
+        with col2:
+            region_counts = facet_options(facets, "Region/City", {"Country": country})
+            selected_region = st.selectbox(
+                "Region/City:", ["All Regions"] + list(region_counts), format_func=facet_label(region_counts), key="pricing_region"
+            )
+            region = None if selected_region == "All Regions" else selected_region
+
+        with col3:
+            method = st.radio(
+                "Pricing between tiers:", PRICING_METHODS, format_func=METHOD_LABELS.get, key="pricing_method"
+            )
+
+        tour_ids = find_tours(matrix, country, region)
+        tier_text = ", ".join(str(t) for t in matrix["tiers"])
+        st.caption(
+            f"{len(tour_ids)} tour(s). Prices are per pax, set for groups of {tier_text}; "
+            f"groups above {matrix['max_pax']} pax get the largest priced tier."
+        )
+
+        if not tour_ids:
+            st.info("No tours match the selected filters.")
+        else:
+            st.markdown("---")
+            st.subheader("🧾 Quote a Tour")
+            q1, q2 = st.columns([3, 1])
+            with q1:
+                tour_id = st.selectbox("Tour:", tour_ids, format_func=lambda i: tour_label(tours, i), key="pricing_tour")
+            with q2:
+                group_size = st.number_input("Group size (pax):", min_value=1, max_value=100, value=2, step=1, key="pricing_pax")
+
+            result = quote(matrix, tour_id, int(group_size), method)
+            m1, m2, m3 = st.columns(3)
+            with m1:
+                st.metric("Per pax", "—" if result["per_pax"] is None else f"{result['per_pax']:,.2f}")
+            with m2:
+                st.metric("Total", "—" if result["total"] is None else f"{result['total']:,.2f}")
+            with m3:
+                days = tours.iloc[tour_id].get("Number of days")
+                st.metric("Days", "—" if days is None or pd.isna(days) else int(days))
+            if result["per_pax"] is None:
+                st.warning("This tour has no price for a group of this size.")
+
+            tier_prices = pd.DataFrame({"Pax tier": matrix["tiers"], "Per pax": matrix["prices"][tour_id]}).dropna()
+            with st.expander("Priced tiers", expanded=False):
+                st.dataframe(tier_prices, use_container_width=True, hide_index=True)
+
+            st.markdown("---")
+            st.subheader("📊 Quote Many")
+            st.caption("Per-pax prices for every selected tour and group size, computed in one batch.")
+            b1, b2 = st.columns([3, 1])
+            with b1:
+                batch_ids = st.multiselect(
+                    "Tours (all filtered tours if empty):", tour_ids, format_func=lambda i: tour_label(tours, i), key="pricing_batch_tours"
+                )
+            with b2:
+                # Up to twice the largest priced tier, so sizes above it can be compared too
+                slider_max = max(2, 2 * int(matrix["max_pax"]))
+                default_range = (min(2, slider_max), min(max(2, int(matrix["max_pax"])), slider_max))
+                pax_range = st.slider("Group sizes:", min_value=1, max_value=slider_max, value=default_range, key="pricing_batch_pax")
+
+            batch_ids = batch_ids or tour_ids
+            sizes = list(range(pax_range[0], pax_range[1] + 1))
+            grid = quote_grid(matrix, batch_ids, sizes, method)
+            grid.index = [tour_label(tours, i) for i in batch_ids]
+            grid.columns = [f"{n} pax" for n in sizes]
+            st.dataframe(grid.style.format("{:,.2f}", na_rep="—"), use_container_width=True)
+            st.download_button(
+                "Download quotes (CSV)",
+                grid.to_csv().encode("utf-8"),
+                file_name="tour_quotes.csv",
+                mime="text/csv",
+                key="pricing_download",
+            )
+
+except Exception as e:
+    st.error(f"Error loading tour pricing: {e}")
@@ -0,0 +1,105 @@
+import datetime
+
+import streamlit as st
+import pandas as pd
+from utils import init_session_state, require_login, facet_options, facet_label
+from tour_pricing import get_price_matrix, get_tour_facets, find_tours, tour_label
+from tour_availability import available_mask, excluded_intervals, find_available_tours, get_availability_index
+
+init_session_state()
+require_login()
+
+st.title("📅 Tour Availability")
+
+try:
+    # Excluded dates are parsed once per tour table version
+    matrix = get_price_matrix()
+    index = get_availability_index()
+    tours = matrix["tours"]
+
+    if tours.empty:
+        st.info("No tours found in the tour database.")
+    else:
+        st.subheader("🔎 Find Tours")
+        facets = get_tour_facets()
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            country_counts = facet_options(facets, "Country", {})
+            selected_country = st.selectbox(
+                "Country:", ["All Countries"] + list(country_counts), format_func=facet_label(country_counts), key="availability_country"
+            )
+            country = None if selected_country == "All Countries" else selected_country
+
+        with col2:
+            region_counts = facet_options(facets, "Region/City", {"Country": country})
+            selected_region = st.selectbox(
+                "Region/City:", ["All Regions"] + list(region_counts), format_func=facet_label(region_counts), key="availability_region"
+            )
+            region = None if selected_region == "All Regions" else selected_region
+
+        with col3:
+            on_date = st.date_input("Date:", value=datetime.date.today(), key="availability_date")
+
+        with col4:
+            group_size = st.number_input("Group size (pax):", min_value=1, max_value=100, value=2, step=1, key="availability_pax")
+
+        available = find_available_tours(on_date, int(group_size), country, region).reset_index(drop=True)
+        st.markdown("---")
+        st.subheader("✅ Available Tours")
+        st.caption(f"{len(available)} tour(s) run on {on_date:%d/%m/%Y} with a price for {int(group_size)} pax.")
+
+        if available.empty:
+            st.info("No tours are available for the selected filters.")
+        else:
+            display = pd.DataFrame({
+                "Tour": [tour_label(tours, i) for i in available["tour_id"]],
+                "Country": available.get("Country"),
+                "Region/City": available.get("Region/City"),
+                "Days": available.get("Number of days"),
+                "Per pax": available["per_pax"].round(2),
+                "Total": available["total"].round(2),
+            })
+            st.dataframe(display, use_container_width=True, hide_index=True)
+
+        # Season view: every filtered tour against every day of a date range
+        st.markdown("---")
+        st.subheader("🗓️ Season Overview")
+        today = datetime.date.today()
+        season = st.date_input(
+            "Date range:", value=(today, today + datetime.timedelta(days=90)), key="availability_season"
+        )
+        tour_ids = find_tours(matrix, country, region)
+        if isinstance(season, (tuple, list)) and len(season) == 2 and tour_ids:
+            dates = pd.date_range(season[0], season[1])
+            mask = available_mask(index, tour_ids, dates)
+            first_blocked = [
+                dates[row.argmin()].strftime("%d/%m/%Y") if not row.all() else "—" for row in mask
+            ]
+            overview = pd.DataFrame({
+                "Tour": [tour_label(tours, i) for i in tour_ids],
+                "Available days": mask.sum(axis=1),
+                "Excluded days": (~mask).sum(axis=1),
+                "First excluded": first_blocked,
+            })
+            st.caption(f"{len(dates)} day(s) from {season[0]:%d/%m/%Y} to {season[1]:%d/%m/%Y}.")
+            st.dataframe(overview, use_container_width=True, hide_index=True)
+
+            with st.expander("Excluded dates of one tour", expanded=False):
+                detail_id = st.selectbox(
+                    "Tour:", tour_ids, format_func=lambda i: tour_label(tours, i), key="availability_detail_tour"
+                )
+                intervals = excluded_intervals(index, detail_id)
+                if intervals:
+                    st.dataframe(
+                        pd.DataFrame(intervals, columns=["From", "To"]), use_container_width=True, hide_index=True
+                    )
+                else:
+                    st.info("No excluded dates recorded for this tour.")
+                if detail_id in index["unparsed"]:
+                    st.warning("Could not read: " + "; ".join(index["unparsed"][detail_id]))
+        else:
+            st.info("Pick a start and end date.")
+
+except Exception as e:
+    st.error(f"Error loading tour availability: {e}")
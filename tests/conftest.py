@@ -0,0 +1,34 @@
+import os
+import queue
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+
+
+def _close_connections() -> None:
+    with utils._writer_lock:
+        if utils._writer_conn is not None:
+            utils._writer_conn.close()
+            utils._writer_conn = None
+    while True:
+        try:
+            utils._read_pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point every pooled and writer connection at an empty temporary database."""
+    _close_connections()
+    monkeypatch.setattr(utils, "DB_FILE", str(tmp_path / "test.db"))
+    # Per-process "already created" flags and caches refer to the previous database
+    monkeypatch.setattr(utils, "_users_table_ready", False)
+    utils._table_cache.clear()
+    utils._derived_cache.clear()
+    yield
+    _close_connections()
@@ -0,0 +1,80 @@
+import pytest
+
+import utils
+from utils import LoginThrottledError, create_user, verify_user
+
+
+@pytest.fixture(autouse=True)
+def fresh_throttle(monkeypatch):
+    monkeypatch.setattr(utils, "_login_attempts", {})
+
+
+def test_forwarded_header_is_ignored_without_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(utils, "TRUSTED_PROXY_HOPS", 0)
+
+    assert utils._forwarded_client_ip("10.0.0.9", {"X-Forwarded-For": "1.2.3.4"}) == "10.0.0.9"
+    assert utils._forwarded_client_ip(None, {"X-Forwarded-For": "1.2.3.4"}) is None
+
+
+def test_trusted_proxy_entry_is_taken_from_the_right(monkeypatch):
+    monkeypatch.setattr(utils, "TRUSTED_PROXY_HOPS", 1)
+    headers = {"X-Forwarded-For": "1.2.3.4, 203.0.113.7"}
+
+    assert utils._forwarded_client_ip("10.0.0.1", headers) == "203.0.113.7"
+    # No header: the peer itself
+    assert utils._forwarded_client_ip("10.0.0.1", {}) == "10.0.0.1"
+
+
+def test_spoofed_forwarded_header_does_not_escape_the_address_limit(db, monkeypatch):
+    monkeypatch.setattr(utils, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(utils, "MAX_FAILURES_PER_IP", 3)
+    create_user("alice", "right")
+
+    for i in range(3):
+        # The client rotates the part it controls; the proxy appends the real address
+        ip = utils._forwarded_client_ip("10.0.0.1", {"X-Forwarded-For": f"198.51.100.{i}, 203.0.113.7"})
+        assert verify_user(f"guess{i}", "wrong", ip) is None
+
+    ip = utils._forwarded_client_ip("10.0.0.1", {"X-Forwarded-For": "198.51.100.99, 203.0.113.7"})
+    with pytest.raises(LoginThrottledError):
+        verify_user("alice", "right", ip)
+
+
+def test_successful_sign_ins_from_one_address_are_not_throttled(db, monkeypatch):
+    monkeypatch.setattr(utils, "MAX_FAILURES_PER_IP", 3)
+    for i in range(5):
+        create_user(f"user{i}", "pw")
+
+    for _ in range(2):
+        for i in range(5):
+            assert verify_user(f"user{i}", "pw", "192.0.2.10")["username"] == f"user{i}"
+    # One mistyped password still leaves the address usable
+    assert verify_user("user0", "typo", "192.0.2.10") is None
+    assert verify_user("user0", "pw", "192.0.2.10") is not None
+
+
+def test_feedback_badge_escapes_database_text():
+    badge = utils.feedback_badge_html("bad", '<img src=x onerror="alert(document.cookie)">')
+
+    assert "<img" not in badge
+    assert "&lt;img src=x onerror=&quot;alert(document.cookie)&quot;&gt;" in badge
+
+
+def test_session_tokens_are_bound_to_their_row(db, monkeypatch):
+    from migrations import apply_migrations
+
+    apply_migrations()
+    create_user("alice", "pw")
+    token = utils.create_session("alice")
+    session_id = token.split(".")[0]
+    assert utils.validate_session_token(token)[0] == session_id
+
+    renewed = utils.renew_session(session_id)
+    assert utils.validate_session_token(renewed)[1]["username"] == "alice"
+    # A forged expiry fails the signature check
+    forged = f"{session_id}.{int(token.split('.')[1]) + 3600}.{token.split('.')[2]}"
+    assert utils.validate_session_token(forged) is None
+
+    utils.revoke_session(session_id)
+    assert utils.validate_session_token(renewed) is None
+    assert utils.renew_session(session_id) is None
@@ -0,0 +1,31 @@
+import sqlite3
+
+import utils
+from utils import PARTNER_TABLE, ensure_partner_search_index, search_partners, write_connection
+
+COLUMNS = '"Partner ID" TEXT, "Partner Name" TEXT, "Description" TEXT, "Location" TEXT, "Country" TEXT'
+
+
+def _replace_partners_from_outside(rows):
+    # Another process (import notebook) replacing the table, which drops its triggers
+    conn = sqlite3.connect(utils.DB_FILE)
+    with conn:
+        conn.execute(f'DROP TABLE "{PARTNER_TABLE}"')
+        conn.execute(f'CREATE TABLE "{PARTNER_TABLE}" ({COLUMNS})')
+        conn.executemany(f'INSERT INTO "{PARTNER_TABLE}" VALUES (?, ?, ?, ?, ?)', rows)
+    conn.close()
+
+
+def test_search_index_is_rebuilt_after_an_outside_replace(db):
+    with write_connection() as conn:
+        conn.execute(f'CREATE TABLE "{PARTNER_TABLE}" ({COLUMNS})')
+        conn.execute(f'INSERT INTO "{PARTNER_TABLE}" VALUES ("P1", "Lotus Hotel", "", "Hue", "Vietnam")')
+    if not ensure_partner_search_index():
+        return  # SQLite without FTS5
+    assert search_partners("lotus")["Partner ID"].tolist() == ["P1"]
+
+    _replace_partners_from_outside([("P2", "Bamboo Boats", "", "Hoi An", "Vietnam"), ("P3", "Lotus Spa", "", "Hue", "Vietnam")])
+
+    assert search_partners("lotus")["Partner ID"].tolist() == ["P3"]
+    assert search_partners("bamboo")["Partner ID"].tolist() == ["P2"]
+
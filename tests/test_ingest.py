@@ -0,0 +1,83 @@
+import pandas as pd
+
+from ingest import _apply_plan, bulk_load_table, plan_upsert
+from utils import quote_ident, read_connection, write_connection
+
+KEY = ["Tour Name", "num_pax"]
+
+
+def _incoming():
+    return pd.DataFrame({
+        "Tour Name": ["Ha Long", "Ha Long", "Sapa", "Sapa"],
+        "num_pax": [2, 4, 2, 2],
+        "price": [120.1, 95.3, 80.0, 82.5],
+        "Note": [None, "peak", None, None],
+    })
+
+
+def _stored(table_name):
+    with read_connection() as conn:
+        return pd.read_sql(f"SELECT rowid, * FROM {quote_ident(table_name)}", conn).set_index("rowid")
+
+
+def _is_empty(plan):
+    return plan["insert"].empty and plan["update"].empty and not plan["delete"]
+
+
+def test_plan_is_empty_for_unchanged_rows():
+    incoming = _incoming()
+    existing = incoming.copy()
+    existing.index = [10, 11, 12, 13]
+    # What SQLite hands back: float noise and numbers stored as text
+    existing["price"] = existing["price"] + 1e-12
+    existing["num_pax"] = existing["num_pax"].astype(str)
+
+    assert _is_empty(plan_upsert(existing, incoming, KEY))
+
+
+def test_plan_matches_rows_by_natural_key():
+    existing = _incoming()
+    existing.index = [10, 11, 12, 13]
+    incoming = _incoming()
+    incoming.loc[1, "price"] = 99.0
+    incoming = incoming.drop(index=0)
+    incoming = pd.concat(
+        [incoming, pd.DataFrame([{"Tour Name": "Hue", "num_pax": 2, "price": 60.0, "Note": None}])],
+        ignore_index=True,
+    )
+
+    plan = plan_upsert(existing, incoming, KEY)
+
+    assert plan["delete"] == [10]
+    assert plan["update"].index.tolist() == [11]
+    assert plan["update"]["price"].tolist() == [99.0]
+    assert plan["insert"]["Tour Name"].tolist() == ["Hue"]
+
+
+def test_duplicate_keys_are_told_apart_by_occurrence():
+    existing = _incoming()
+    existing.index = [10, 11, 12, 13]
+    incoming = _incoming()
+    # Second "Sapa / 2" row changes, the first stays
+    incoming.loc[3, "price"] = 90.0
+
+    plan = plan_upsert(existing, incoming, KEY)
+
+    assert plan["update"].index.tolist() == [13]
+    assert plan["insert"].empty and not plan["delete"]
+
+
+def test_replanning_after_applying_is_empty(db):
+    bulk_load_table("Tours", _incoming())
+    assert _is_empty(plan_upsert(_stored("Tours"), _incoming(), KEY))
+
+    incoming = _incoming()
+    incoming.loc[2, "price"] = 85.25
+    incoming = pd.concat(
+        [incoming.drop(index=0), pd.DataFrame([{"Tour Name": "Hue", "num_pax": 2, "price": 60.0, "Note": None}])],
+        ignore_index=True,
+    )
+    with write_connection() as conn:
+        _apply_plan(conn, "Tours", plan_upsert(_stored("Tours"), incoming, KEY))
+
+    assert _is_empty(plan_upsert(_stored("Tours"), incoming, KEY))
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from utils import ROWID_COLUMN, diff_frames, fetch_table_window, read_connection, save_changeset, write_connection
+
+
+def _snapshot():
+    return pd.DataFrame({
+        ROWID_COLUMN: [1, 2, 3],
+        "Name": ["A", "B", "B"],
+        "Pax": [5, 6, 7],
+        "Note": [None, "x", None],
+    })
+
+
+def _with_new_row(df, **values):
+    # data_editor adds rows with an empty rowid, which turns the int columns into floats
+    return pd.concat([df, pd.DataFrame([values])], ignore_index=True)
+
+
+def test_diff_update_insert_delete_by_rowid():
+    original = _snapshot()
+    edited = original.copy()
+    edited.loc[1, "Note"] = "changed"
+    edited = edited.drop(index=2)
+    edited = _with_new_row(edited, Name="C", Pax=8, Note=None)
+
+    changeset = diff_frames(original, edited, key=ROWID_COLUMN)
+
+    assert changeset["updated"] == {2: ["Note"]}
+    assert changeset["deleted"] == [3]
+    assert changeset["inserted"][["Name", "Pax"]].to_dict("records") == [{"Name": "C", "Pax": 8}]
+    assert ROWID_COLUMN not in changeset["inserted"].columns
+
+
+def test_diff_missing_values_compare_equal():
+    original = _snapshot()
+    edited = original.copy()
+    edited["Note"] = [np.nan, "x", np.nan]
+
+    changeset = diff_frames(original, edited, key=ROWID_COLUMN)
+
+    assert changeset["updated"] == {}
+    assert changeset["deleted"] == []
+    assert changeset["inserted"].empty
+
+
+def test_diff_int_vs_float_after_adding_a_row():
+    original = _snapshot()
+    edited = _with_new_row(original, **{ROWID_COLUMN: np.nan, "Name": "D", "Pax": np.nan, "Note": None})
+    assert edited["Pax"].dtype == "float64"
+    assert edited[ROWID_COLUMN].dtype == "float64"
+
+    changeset = diff_frames(original, edited, key=ROWID_COLUMN)
+
+    assert changeset["updated"] == {}
+    assert changeset["deleted"] == []
+    assert changeset["inserted"]["Name"].tolist() == ["D"]
+
+
+def test_save_changeset_writes_by_rowid(db):
+    with write_connection() as conn:
+        conn.execute('CREATE TABLE "Trips" ("Name" TEXT, "Pax" INTEGER, "Note" TEXT)')
+        conn.executemany(
+            'INSERT INTO "Trips" VALUES (?, ?, ?)',
+            [("A", 5, None), ("B", 6, "x"), ("B", 7, None)],
+        )
+    original = fetch_table_window("Trips", limit=10)
+    # Two rows share the name "B"; only the edited one may change
+    edited = original.copy()
+    edited.loc[original[ROWID_COLUMN] == 3, "Note"] = "late"
+    edited = edited[edited[ROWID_COLUMN] != 1]
+    edited = _with_new_row(edited, Name="C", Pax=8, Note=None)
+
+    changeset = diff_frames(original, edited, key=ROWID_COLUMN)
+    counts = save_changeset("Trips", edited, changeset)
+
+    assert counts == {"updated": 1, "inserted": 1, "deleted": 1}
+    with read_connection() as conn:
+        rows = conn.execute('SELECT rowid, "Name", "Pax", "Note" FROM "Trips" ORDER BY rowid').fetchall()
+    assert rows == [(2, "B", 6, "x"), (3, "B", 7, "late"), (4, "C", 8, None)]
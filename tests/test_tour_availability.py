@@ -0,0 +1,104 @@
+import datetime
+
+import pandas as pd
+
+from tour_availability import (
+    EXCLUDED_COLUMN, OPEN_END, available_mask, build_availability_index, excluded_intervals, parse_excluded_dates,
+)
+
+D = datetime.date
+YEARS = [2025, 2026]
+
+
+def test_single_dates_and_ranges():
+    intervals, unparsed = parse_excluded_dates(
+        "02/09/2025, 24-25/12/2025\n28/01-02/02/2026 & 22/12/2025 - 06/01/2026", YEARS
+    )
+
+    assert intervals == [
+        (D(2025, 9, 2), D(2025, 9, 2)),
+        (D(2025, 12, 24), D(2025, 12, 25)),
+        (D(2026, 1, 28), D(2026, 2, 2)),
+        (D(2025, 12, 22), D(2026, 1, 6)),
+    ]
+    assert unparsed == []
+
+
+def test_dots_and_two_digit_years():
+    intervals, _ = parse_excluded_dates("28.01-01.02/2026\n30/04/26", YEARS)
+
+    assert intervals == [(D(2026, 1, 28), D(2026, 2, 1)), (D(2026, 4, 30), D(2026, 4, 30))]
+
+
+def test_year_less_entries_repeat_every_year():
+    intervals, _ = parse_excluded_dates("01-03/05, 30/04", YEARS)
+
+    assert intervals == [
+        (D(2025, 5, 1), D(2025, 5, 3)),
+        (D(2026, 5, 1), D(2026, 5, 3)),
+        (D(2025, 4, 30), D(2025, 4, 30)),
+        (D(2026, 4, 30), D(2026, 4, 30)),
+    ]
+
+
+def test_year_less_range_wraps_the_new_year():
+    intervals, _ = parse_excluded_dates("24/12-03/01", YEARS)
+
+    assert intervals == [(D(2024, 12, 24), D(2025, 1, 3)), (D(2025, 12, 24), D(2026, 1, 3))]
+
+
+def test_valid_till_excludes_everything_after_that_month():
+    assert parse_excluded_dates("Valid till Mar 2026", YEARS)[0] == [(D(2026, 4, 1), OPEN_END)]
+    assert parse_excluded_dates("valid until December 2025", YEARS)[0] == [(D(2026, 1, 1), OPEN_END)]
+
+
+def test_leading_labels_are_dropped():
+    intervals, unparsed = parse_excluded_dates("Closed on 01/05/2025\nTet: 16-18/02/2026\nsoon", YEARS)
+
+    assert intervals == [(D(2025, 5, 1), D(2025, 5, 1)), (D(2026, 2, 16), D(2026, 2, 18))]
+    assert unparsed == ["soon"]
+
+
+def test_surcharges_and_notes():
+    intervals, unparsed = parse_excluded_dates('"Extra charge on: 30/04 - 01/05"\nTet: to be update\nNo', YEARS)
+
+    assert intervals == []
+    assert unparsed == ["to be update"]
+    assert parse_excluded_dates(None, YEARS) == ([], [])
+    assert parse_excluded_dates(float("nan"), YEARS) == ([], [])
+
+
+def test_index_lookup_matches_parsed_intervals():
+    tours = pd.DataFrame({EXCLUDED_COLUMN: ["24-26/12/2025, 25/12/2025", None, "Valid till Mar 2026", "soon"]})
+    index = build_availability_index(tours, today=D(2025, 6, 1))
+    dates = [D(2025, 12, 23), D(2025, 12, 25), D(2025, 12, 27), D(2026, 4, 1)]
+
+    mask = available_mask(index, [0, 1, 2, 3], dates)
+
+    assert mask.tolist() == [
+        [True, False, True, True],
+        [True, True, True, True],
+        [True, True, True, False],
+        [True, True, True, True],
+    ]
+    # Overlapping entries are merged
+    assert excluded_intervals(index, 0) == [(D(2025, 12, 24), D(2025, 12, 26))]
+    assert index["unparsed"] == {3: ["soon"]}
+
+
+def test_recurring_leap_day_skips_years_without_it():
+    years = [2024, 2025, 2026]
+
+    assert parse_excluded_dates("29/02", years) == ([(D(2024, 2, 29), D(2024, 2, 29))], [])
+    assert parse_excluded_dates("01-29/02", years)[0] == [
+        (D(2024, 2, 1), D(2024, 2, 29)),
+        (D(2025, 2, 1), D(2025, 2, 28)),
+        (D(2026, 2, 1), D(2026, 2, 28)),
+    ]
+    assert parse_excluded_dates("29/02-02/03", years)[0] == [
+        (D(2024, 2, 29), D(2024, 3, 2)),
+        (D(2025, 3, 1), D(2025, 3, 2)),
+        (D(2026, 3, 1), D(2026, 3, 2)),
+    ]
+    # Days that exist in no year, or an explicit 29/02 of a common year, stay unparsed
+    assert parse_excluded_dates("30/02, 29/02/2025", years) == ([], ["30/02", "29/02/2025"])
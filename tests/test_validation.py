@@ -0,0 +1,88 @@
+import pandas as pd
+
+from utils import FEEDBACK_TABLE, PARTNER_TABLE
+from validation import validate
+
+
+def _dates(values):
+    df = pd.DataFrame({"Partner ID": [f"P{i}" for i in range(len(values))], "Date": values})
+    return validate(FEEDBACK_TABLE, df)
+
+
+def test_iso_dates_are_not_read_day_first():
+    df, violations = _dates(["2024-03-05", "2024-03-05 10:30:00", " 2024-12-01 "])
+
+    assert df["Date"].tolist() == [
+        pd.Timestamp(2024, 3, 5), pd.Timestamp(2024, 3, 5, 10, 30), pd.Timestamp(2024, 12, 1),
+    ]
+    assert violations.empty
+
+
+def test_other_text_dates_are_day_first():
+    df, violations = _dates(["05/03/2024", "13/01/2024", "5 Mar 2024"])
+
+    assert df["Date"].tolist() == [pd.Timestamp(2024, 3, 5), pd.Timestamp(2024, 1, 13), pd.Timestamp(2024, 3, 5)]
+    assert violations.empty
+
+
+def test_mixed_iso_and_day_first_in_one_column():
+    df, _ = _dates(["2024-03-05", "06/03/2024", pd.Timestamp(2024, 3, 7)])
+
+    assert df["Date"].tolist() == [pd.Timestamp(2024, 3, 5), pd.Timestamp(2024, 3, 6), pd.Timestamp(2024, 3, 7)]
+
+
+def test_unreadable_dates_are_cleared():
+    df, violations = _dates(["2024-03-05", "soon", None])
+
+    assert df["Date"].isna().tolist() == [False, True, True]
+    assert violations[["source_row", "rule", "value", "action"]].to_dict("records") == [
+        {"source_row": 1, "rule": "type:date", "value": "soon", "action": "cleared"},
+    ]
+
+
+def test_partner_rules():
+    df = pd.DataFrame({
+        "Partner ID": ["P1", " ", "P2", None],
+        "Status": [" approved ", "Approved", "on hold", None],
+        "Note": [None, None, "call first", None],
+    })
+
+    clean, violations = validate(PARTNER_TABLE, df)
+
+    # The all-blank row is padding; the row whose Partner ID is only whitespace is rejected
+    assert clean.index.tolist() == [0, 2]
+    assert clean["Status"].tolist() == ["Approved", None]
+    assert clean["Note"].isna().tolist() == [True, False]
+    assert clean.loc[2, "Note"] == "call first; on hold"
+    assert sorted(violations["action"]) == ["fixed", "moved", "rejected"]
+
+
+def test_unique_is_checked_across_chunks():
+    df = pd.DataFrame({"Partner ID": ["P1", "P2", "P3", "P1", "P2", "P1", "P4"]})
+    seen = {}
+    found = [validate(PARTNER_TABLE, chunk, seen)[1] for chunk in (df.iloc[:2], df.iloc[2:5], df.iloc[5:])]
+    chunked = pd.concat(found, ignore_index=True)
+
+    _, whole = validate(PARTNER_TABLE, df)
+
+    assert sorted(chunked["source_row"]) == sorted(whole["source_row"]) == [0, 1, 3, 4, 5]
+    assert set(chunked["action"]) == {"flagged"}
+
+
+def test_columns_without_text_dates():
+    df, violations = _dates([pd.Timestamp(2024, 3, 5), None, pd.Timestamp(2024, 3, 7)])
+
+    assert df["Date"].tolist()[0] == pd.Timestamp(2024, 3, 5)
+    assert df["Date"].isna().tolist() == [False, True, False]
+    assert violations.empty
+    assert _dates([float("nan"), float("nan")])[0]["Date"].isna().all()
+
+
+def test_overflow_column_exists_without_bad_values():
+    df = pd.DataFrame({"Partner ID": ["P1"], "Status": ["Approved"]})
+
+    clean, violations = validate(PARTNER_TABLE, df)
+
+    assert "Note" in clean.columns
+    assert clean["Note"].isna().all()
+    assert violations.empty
@@ -0,0 +1,241 @@
+"""Tour availability from the free-text EXCLUDED DATES column.
+
+Each tour's text is parsed once into closed date intervals (merged and
+sorted), then all tours are packed into one interval index: flat start/end
+day arrays ordered by (tour, start). A (tour, day) lookup is a single
+searchsorted over combined keys, so checking every tour against a whole
+season of dates is one vectorized call. Tour ids are the row positions of
+tour_pricing's price matrix, so availability and quotes line up.
+
+Recognized text (one entry per line, comma or "&"):
+  02/09/2025  24-25/12/2025  28/01-02/02/2025  22/12/2025 - 06/01/2026
+  28.01-01.02/2025 (dots as separators)
+  01-03/01  25/01-04/02 (no year: excluded every year)
+  Valid till Mar 2026 (not available after that month)
+Lines about surcharges ("Extra charge on ...") are not exclusions, and
+anything else that is not a date is kept as an unparsed note.
+"""
+
+import calendar
+import datetime
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tour_pricing import find_tours, get_price_matrix, quote_batch
+from utils import TOUR_TABLE, cached_derived
+
+EXCLUDED_COLUMN = "EXCLUDED DATES"
+# Year-less exclusions repeat every year; they are expanded over this window
+RECURRING_YEARS_BACK = 1
+RECURRING_YEARS_AHEAD = 5
+# Upper bound for open-ended exclusions ("Valid till ...")
+OPEN_END = datetime.date(9999, 12, 31)
+
+_DATE = r"(\d{1,2})(?:/(\d{1,2}))?(?:/(\d{2,4}))?"
+_RANGE_RE = re.compile(rf"^{_DATE}\s*-\s*{_DATE}$")
+_SINGLE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?$")
+_VALID_TILL_RE = re.compile(r"valid\s+(?:till|until)\s+([a-z]{3})[a-z]*\.?\s+(\d{4})", re.IGNORECASE)
+# Leading label such as "Closed on" or "Tet:"; "on" must be a whole word
+_LABEL_RE = re.compile(r"^[A-Za-z ]+(?:\bon\b|:)\s*")
+_NOT_EXCLUSIONS = ("extra charge", "surcharge")
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+
+def _year(text: Optional[str]) -> Optional[int]:
+    if not text:
+        return None
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _recurring(day: int, month: int) -> None:
+    # Raises ValueError for a day that exists in no year; 29/02 exists in leap years
+    datetime.date(2000, month, day)
+
+
+def _dates(day: int, month: int, year: Optional[int], years: Sequence[int]) -> List[datetime.date]:
+    if year:
+        return [datetime.date(year, month, day)]
+    _recurring(day, month)
+    return [datetime.date(y, month, day) for y in years if calendar.isleap(y) or (month, day) != (2, 29)]
+
+
+def parse_excluded_dates(text: Any, years: Sequence[int]) -> Tuple[List[Tuple[datetime.date, datetime.date]], List[str]]:
+    """Parse one EXCLUDED DATES cell into (intervals, unparsed fragments).
+
+    Dates are day-first. years is used for entries without a year.
+    """
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return [], []
+    intervals: List[Tuple[datetime.date, datetime.date]] = []
+    unparsed: List[str] = []
+    for line in str(text).replace('"', "").splitlines():
+        line = line.strip()
+        if not line or line.lower() in ("no", "none", "-"):
+            continue
+        if any(word in line.lower() for word in _NOT_EXCLUSIONS):
+            continue
+        valid_till = _VALID_TILL_RE.search(line)
+        if valid_till and valid_till.group(1).lower() in _MONTHS:
+            year, month = int(valid_till.group(2)), _MONTHS[valid_till.group(1).lower()]
+            first_after = datetime.date(year + month // 12, month % 12 + 1, 1)
+            intervals.append((first_after, OPEN_END))
+            continue
+        line = _LABEL_RE.sub("", line).replace(".", "/")
+        for part in re.split(r"\s*(?:,|&)\s*", line):
+            try:
+                intervals.extend(_parse_part(part, years))
+            except ValueError:
+                unparsed.append(part)
+    return intervals, unparsed
+
+
+def _parse_part(part: str, years: Sequence[int]) -> List[Tuple[datetime.date, datetime.date]]:
+    single = _SINGLE_RE.match(part)
+    if single:
+        day, month, year = int(single.group(1)), int(single.group(2)), _year(single.group(3))
+        return [(d, d) for d in _dates(day, month, year, years)]
+    span = _RANGE_RE.match(part)
+    if not span:
+        raise ValueError(part)
+    d1, m1, y1, d2, m2, y2 = span.groups()
+    if m2 is None:
+        raise ValueError(part)
+    # Missing parts of the start date come from the end date ("24-25/12/2025")
+    end_month, end_year = int(m2), _year(y2)
+    start_month = int(m1) if m1 else end_month
+    start_year = _year(y1) or end_year
+    intervals = []
+    if not end_year:
+        _recurring(int(d2), end_month)
+        _recurring(int(d1), start_month)
+
+    def on(year: int, month: int, day: int, is_end: bool) -> datetime.date:
+        if end_year or calendar.isleap(year) or (month, day) != (2, 29):
+            return datetime.date(year, month, day)
+        # Outside leap years a recurring 29/02 bound becomes 28/02 (end) or 01/03 (start)
+        return datetime.date(year, 2, 28) if is_end else datetime.date(year, 3, 1)
+
+    for year in ([end_year] if end_year else years):
+        end = on(year, end_month, int(d2), True)
+        start_y = start_year if start_year and end_year else year
+        start = on(start_y, start_month, int(d1), False)
+        if start > end:
+            # Wraps the new year ("24/12-03/01")
+            start = on(start_y - 1, start_month, int(d1), False)
+        intervals.append((start, end))
+    return intervals
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _day(value: datetime.date) -> int:
+    return value.toordinal()
+
+
+_EPOCH_DAY = _day(datetime.date(1970, 1, 1))
+
+
+def build_availability_index(tours: pd.DataFrame, today: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """Parse every tour's excluded dates once and pack them into flat interval arrays."""
+    today = today or datetime.date.today()
+    years = range(today.year - RECURRING_YEARS_BACK, today.year + RECURRING_YEARS_AHEAD + 1)
+    texts = tours[EXCLUDED_COLUMN] if EXCLUDED_COLUMN in tours.columns else pd.Series(None, index=tours.index)
+    tour_of: List[int] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    unparsed: Dict[int, List[str]] = {}
+    parsed_text: Dict[Any, Tuple[List[Tuple[int, int]], List[str]]] = {}
+    for tour_id, text in enumerate(texts.tolist()):
+        # Many tours share the same text; parse each distinct value once
+        cache_key = None if text is None or (isinstance(text, float) and np.isnan(text)) else str(text)
+        if cache_key not in parsed_text:
+            intervals, bad = parse_excluded_dates(cache_key, years)
+            parsed_text[cache_key] = (_merge([(_day(s), _day(e)) for s, e in intervals]), bad)
+        merged, bad = parsed_text[cache_key]
+        for start, end in merged:
+            tour_of.append(tour_id)
+            starts.append(start)
+            ends.append(end)
+        if bad:
+            unparsed[tour_id] = bad
+    tour_arr = np.asarray(tour_of, dtype=np.int64)
+    start_arr = np.asarray(starts, dtype=np.int64)
+    return {
+        # Sorted because tours are visited in order and intervals are merged
+        "keys": (tour_arr << 32) | start_arr,
+        "tour_of": tour_arr,
+        "starts": start_arr,
+        "ends": np.asarray(ends, dtype=np.int64),
+        "unparsed": unparsed,
+        "tours": len(tours),
+    }
+
+
+def get_availability_index() -> Dict[str, Any]:
+    """Interval index over the stored tours, rebuilt only when the tour table changes."""
+    return cached_derived(
+        "tour_availability_index",
+        [TOUR_TABLE],
+        lambda: build_availability_index(get_price_matrix()["tours"]),
+    )
+
+
+def available_mask(index: Dict[str, Any], tour_ids: Sequence[int], dates: Sequence[Any]) -> np.ndarray:
+    """Boolean tours x dates array: True where the tour is not excluded on that date."""
+    ids = np.asarray(tour_ids, dtype=np.int64)[:, None]
+    days = (pd.to_datetime(list(dates)).to_numpy().astype("datetime64[D]").astype(np.int64) + _EPOCH_DAY)[None, :]
+    if not len(index["keys"]):
+        return np.ones((ids.shape[0], days.shape[1]), dtype=bool)
+    # Last interval of the same tour starting on or before the day
+    pos = np.searchsorted(index["keys"], (ids << 32) | days, side="right") - 1
+    safe = np.clip(pos, 0, None)
+    excluded = (pos >= 0) & (index["tour_of"][safe] == ids) & (index["ends"][safe] >= days)
+    return ~excluded
+
+
+def excluded_intervals(index: Dict[str, Any], tour_id: int) -> List[Tuple[datetime.date, datetime.date]]:
+    """Merged excluded intervals of one tour, as dates."""
+    lo, hi = np.searchsorted(index["keys"], [tour_id << 32, (tour_id + 1) << 32])
+    return [
+        (datetime.date.fromordinal(int(s)), datetime.date.fromordinal(int(e)))
+        for s, e in zip(index["starts"][lo:hi], index["ends"][lo:hi])
+    ]
+
+
+def find_available_tours(
+    on_date: Any,
+    group_size: Optional[int] = None,
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    method: str = "tier",
+) -> pd.DataFrame:
+    """Tours (filtered by Country and Region/City) that run on a date.
+
+    With group_size, tours without a price for that group are left out and
+    per-pax and total prices are added.
+    """
+    matrix = get_price_matrix()
+    index = get_availability_index()
+    tour_ids = np.asarray(find_tours(matrix, country, region), dtype=np.int64)
+    result = matrix["tours"].iloc[tour_ids].assign(tour_id=tour_ids)
+    if not len(tour_ids):
+        return result
+    keep = available_mask(index, tour_ids, [on_date])[:, 0]
+    if group_size is not None:
+        quotes = quote_batch(matrix, tour_ids, np.full(len(tour_ids), int(group_size)), method)
+        keep &= quotes["per_pax"].notna().to_numpy()
+        result = result.assign(per_pax=quotes["per_pax"].to_numpy(), total=quotes["total"].to_numpy())
+    return result[keep]
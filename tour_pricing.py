@@ -0,0 +1,153 @@
+"""Tour quoting over the MYA Tour Database.
+
+The table stores one row per (tour, num_pax tier) with a per-pax price, and
+only some tiers are priced (2-10, 12, 14, with gaps per tour). The price
+matrix keeps one row per tour variant and precomputes a dense per-pax price
+for every group size from 1 to the largest tier, so a quote is one array
+lookup and a batch of quotes is one fancy-indexing step.
+
+Pricing methods for group sizes without their own tier:
+  tier    price of the nearest priced tier at or below the group size
+  linear  straight-line interpolation between the neighbouring priced tiers
+Groups larger than the largest priced tier get that tier's price; groups
+smaller than the smallest priced tier cannot be quoted (NaN).
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import TOUR_TABLE, build_facet_index, cached_derived, load_table
+
+# Columns that identify one priced tour variant
+TOUR_KEY = ["Country", "Region/City", "Tour Name", "PL TL YES/NO"]
+TOUR_INFO = ["Number of days", "Default Time of Start", "EXCLUDED DATES", "NOTES"]
+PRICING_METHODS = ("tier", "linear")
+
+
+def _dense_prices(tiers: np.ndarray, prices: np.ndarray, max_pax: int, method: str) -> np.ndarray:
+    """Per-pax price for group sizes 0..max_pax, one row per tour."""
+    sizes = np.arange(max_pax + 1)
+    dense = np.full((len(prices), max_pax + 1), np.nan)
+    for i, row in enumerate(prices):
+        priced = ~np.isnan(row)
+        if not priced.any():
+            continue
+        known_pax, known_price = tiers[priced], row[priced]
+        if method == "linear":
+            dense[i] = np.interp(sizes, known_pax, known_price, left=np.nan)
+        else:
+            at = np.searchsorted(known_pax, sizes, side="right") - 1
+            dense[i] = np.where(at >= 0, known_price[np.clip(at, 0, None)], np.nan)
+    return dense
+
+
+def build_price_matrix(df: pd.DataFrame) -> Dict[str, Any]:
+    """Pivot the long tour table into tours x tiers plus dense per-method lookups."""
+    key = [c for c in TOUR_KEY if c in df.columns]
+    if df.empty or not {"num_pax", "price"}.issubset(df.columns):
+        empty = np.empty((0, 1))
+        return {"tours": pd.DataFrame(columns=key), "tiers": np.array([], dtype=int), "prices": empty,
+                "dense": {m: empty for m in PRICING_METHODS}, "max_pax": 0}
+    rows = df.dropna(subset=["num_pax"])
+    codes, uniques = pd.MultiIndex.from_frame(rows[key].fillna("")).factorize()
+    tiers, tier_pos = np.unique(rows["num_pax"].to_numpy(dtype=int), return_inverse=True)
+    prices = np.full((len(uniques), len(tiers)), np.nan)
+    prices[codes, tier_pos] = pd.to_numeric(rows["price"], errors="coerce").to_numpy(dtype=float)
+
+    info = [c for c in TOUR_INFO if c in rows.columns]
+    tours = rows.groupby(codes, sort=True)[key + info].first().reset_index(drop=True)
+    tours["Tiers priced"] = (~np.isnan(prices)).sum(axis=1)
+    max_pax = int(tiers.max())
+    return {
+        "tours": tours,
+        "tiers": tiers,
+        "prices": prices,
+        "dense": {m: _dense_prices(tiers, prices, max_pax, m) for m in PRICING_METHODS},
+        "max_pax": max_pax,
+    }
+
+
+def get_price_matrix() -> Dict[str, Any]:
+    """Price matrix of the stored tour table, rebuilt only when the table changes."""
+    return cached_derived("tour_price_matrix", [TOUR_TABLE], lambda: build_price_matrix(load_table(TOUR_TABLE)))
+
+
+def get_tour_facets() -> Dict[str, Any]:
+    """Country / Region/City facet index counting tour variants rather than tier rows."""
+    return cached_derived(
+        "tour_facets",
+        [TOUR_TABLE],
+        lambda: build_facet_index(get_price_matrix()["tours"], ["Country", "Region/City"]),
+    )
+
+
+def quote_batch(
+    matrix: Dict[str, Any],
+    tour_ids: Sequence[int],
+    group_sizes: Sequence[int],
+    method: str = "tier",
+) -> pd.DataFrame:
+    """Quote many (tour, group size) pairs at once.
+
+    tour_ids are row positions in matrix["tours"]. Returns per_pax and total
+    (NaN where no quote is possible), aligned with the inputs.
+    """
+    if method not in PRICING_METHODS:
+        raise ValueError(f"Unknown pricing method '{method}'.")
+    ids = np.asarray(tour_ids, dtype=int)
+    pax = np.asarray(group_sizes, dtype=int)
+    ids, pax = np.broadcast_arrays(ids, pax)
+    per_pax = np.full(ids.shape, np.nan)
+    valid = (pax >= 1) & (ids >= 0) & (ids < len(matrix["tours"]))
+    if matrix["max_pax"]:
+        per_pax[valid] = matrix["dense"][method][ids[valid], np.minimum(pax[valid], matrix["max_pax"])]
+    return pd.DataFrame({"tour_id": ids, "group_size": pax, "per_pax": per_pax, "total": per_pax * pax})
+
+
+def quote(matrix: Dict[str, Any], tour_id: int, group_size: int, method: str = "tier") -> Dict[str, Optional[float]]:
+    """Quote one tour for one group size; per_pax and total are None if it cannot be priced."""
+    row = quote_batch(matrix, [tour_id], [group_size], method).iloc[0]
+    per_pax = None if np.isnan(row["per_pax"]) else float(row["per_pax"])
+    return {"per_pax": per_pax, "total": None if per_pax is None else per_pax * group_size}
+
+
+def quote_grid(
+    matrix: Dict[str, Any],
+    tour_ids: Sequence[int],
+    group_sizes: Sequence[int],
+    method: str = "tier",
+) -> pd.DataFrame:
+    """Per-pax prices for every tour x group size combination (tours as rows)."""
+    ids = np.repeat(np.asarray(tour_ids, dtype=int), len(group_sizes))
+    pax = np.tile(np.asarray(group_sizes, dtype=int), len(tour_ids))
+    quotes = quote_batch(matrix, ids, pax, method)
+    return pd.DataFrame(
+        quotes["per_pax"].to_numpy().reshape(len(tour_ids), len(group_sizes)),
+        index=list(tour_ids),
+        columns=list(group_sizes),
+    )
+
+
+def tour_label(tours: pd.DataFrame, tour_id: int) -> str:
+    row = tours.iloc[tour_id]
+    label = str(row.get("Tour Name", tour_id))
+    variant = row.get("PL TL YES/NO")
+    if variant is not None and not pd.isna(variant) and variant != "":
+        label += f" (PL/TL: {variant})"
+    return label
+
+
+def find_tours(matrix: Dict[str, Any], country: Optional[str] = None, region: Optional[str] = None) -> List[int]:
+    """Tour ids filtered by Country and Region/City (None means any), sorted by name."""
+    tours = matrix["tours"]
+    mask = np.ones(len(tours), dtype=bool)
+    if country is not None and "Country" in tours.columns:
+        mask &= tours["Country"].eq(country).to_numpy()
+    if region is not None and "Region/City" in tours.columns:
+        mask &= tours["Region/City"].eq(region).to_numpy()
+    ids = np.flatnonzero(mask)
+    if "Tour Name" in tours.columns:
+        ids = ids[np.argsort(tours["Tour Name"].astype(str).to_numpy()[ids], kind="stable")]
+    return ids.tolist()
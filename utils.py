@@ -1,45 +1,1400 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 import streamlit as st
 import os
+import base64
 import hashlib
 import hmac
-from typing import Optional, Dict, List, Tuple, Any
+import html
+import itertools
+import math
+import queue
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Any, Iterator, Callable, Sequence
 
 DB_FILE = "MYAdb.db"
 
+# Hidden column carrying SQLite's rowid through the table editor
+ROWID_COLUMN = "__rowid__"
+
+# Connection tuning shared by every pooled connection
+BUSY_TIMEOUT_MS = 10_000
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+BULK_CACHE_SIZE_KIB = 512 * 1024
+WAL_AUTOCHECKPOINT_PAGES = 1000
+READ_POOL_SIZE = 32
+
+# -----------------
+# Database connections
+# -----------------
+
+_read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+_writer_lock = threading.RLock()
+_writer_conn: Optional[sqlite3.Connection] = None
+
+
+def _open_connection() -> sqlite3.Connection:
+    """Open a tuned connection that may be handed between script threads."""
+    conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE_BYTES}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+@contextmanager
+def read_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection for reads.
+
+    Each script thread holds its own connection for the duration of the block,
+    so concurrent sessions read in parallel under WAL without reconnecting.
+    """
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = _open_connection()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _read_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def _get_writer() -> sqlite3.Connection:
+    """Return the shared writer connection; callers must hold _writer_lock."""
+    global _writer_conn
+    if _writer_conn is None:
+        _writer_conn = _open_connection()
+        _writer_conn.isolation_level = None
+    return _writer_conn
+
+
+@contextmanager
+def write_connection() -> Iterator[sqlite3.Connection]:
+    """Run a block on the single serialized writer inside one transaction.
+
+    Commits on success and rolls back on error. Re-entrant calls from the same
+    thread join the outer transaction.
+    """
+    with _writer_lock:
+        conn = _get_writer()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            if conn.in_transaction:
+                conn.commit()
+
+
+@contextmanager
+def bulk_write_connection() -> Iterator[sqlite3.Connection]:
+    """write_connection() tuned for large loads.
+
+    Grows the page cache and holds off WAL auto-checkpoints while the block
+    runs, then checkpoints once. Durability settings are left alone.
+    """
+    with _writer_lock:
+        conn = _get_writer()
+        conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+        try:
+            with write_connection() as conn:
+                yield conn
+        finally:
+            conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+            conn.execute(f"PRAGMA wal_autocheckpoint={WAL_AUTOCHECKPOINT_PAGES}")
+            if not conn.in_transaction:
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+# -----------------
+# Table cache
+# -----------------
+
+_cache_lock = threading.Lock()
+_table_versions: Dict[str, int] = {}
+_table_cache: Dict[str, Tuple[Tuple[int, int], pd.DataFrame]] = {}
+_derived_cache: Dict[str, Tuple[Tuple[Tuple[int, int], ...], Any]] = {}
+_cache_stats = {"hits": 0, "misses": 0}
+_last_data_version = 0
+
+
+def bump_table_version(*table_names: str) -> None:
+    """Mark tables as changed so cached frames are reloaded on next access."""
+    with _cache_lock:
+        for name in table_names:
+            _table_versions[name] = _table_versions.get(name, 0) + 1
+
+
+def _external_data_version() -> int:
+    """Return PRAGMA data_version as seen by the writer.
+
+    The value only moves when another connection commits, i.e. when the
+    database is changed from outside this process (ETL notebook, CLI). If the
+    writer is busy, the last observed value is reused rather than waiting.
+    """
+    global _last_data_version
+    if _writer_lock.acquire(blocking=False):
+        try:
+            row = _get_writer().execute("PRAGMA data_version").fetchone()
+            _last_data_version = int(row[0])
+        finally:
+            _writer_lock.release()
+    return _last_data_version
+
+
+def get_table_version(table_name: str) -> Tuple[int, int]:
+    external = _external_data_version()
+    with _cache_lock:
+        return (_table_versions.get(table_name, 0), external)
+
+
+def load_table(table_name: str) -> pd.DataFrame:
+    """Return the full contents of a table from the shared process cache.
+
+    The frame is shared between sessions, so treat it as read-only and call
+    .copy() before mutating it.
+    """
+    version = get_table_version(table_name)
+    with _cache_lock:
+        entry = _table_cache.get(table_name)
+        if entry is not None and entry[0] == version:
+            _cache_stats["hits"] += 1
+            return entry[1]
+        _cache_stats["misses"] += 1
+    with read_connection() as conn:
+        df = pd.read_sql(f"SELECT * FROM {quote_ident(table_name)}", conn)
+    with _cache_lock:
+        _table_cache[table_name] = (version, df)
+    return df
+
+
+def cached_derived(name: str, source_tables: Sequence[str], build: Callable[[], Any]) -> Any:
+    """Memoize a value built from one or more tables until any of them changes."""
+    version = tuple(get_table_version(t) for t in source_tables)
+    with _cache_lock:
+        entry = _derived_cache.get(name)
+        if entry is not None and entry[0] == version:
+            _cache_stats["hits"] += 1
+            return entry[1]
+        _cache_stats["misses"] += 1
+    value = build()
+    with _cache_lock:
+        _derived_cache[name] = (version, value)
+    return value
+
+
+def get_table_cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "tables": len(_table_cache),
+            "derived": len(_derived_cache),
+        }
+
+
 def quote_ident(name: str) -> str:
     return '"' + name.replace('"', '""') + '"'
 
 def get_table_names(conn):
-    query = "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;"
+    """List user-facing tables; internal helper tables are prefixed with '_', SQLite's own with 'sqlite_'."""
+    query = (
+        "SELECT name FROM sqlite_master WHERE type='table' "
+        "AND name NOT LIKE '\\_%' ESCAPE '\\' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY name;"
+    )
     return pd.read_sql(query, conn)["name"].tolist()
 
 def get_table_columns(conn, table_name):
     query = f"PRAGMA table_info({quote_ident(table_name)})"
     return pd.read_sql(query, conn)
 
-def insert_row(conn, table_name, data):
+def insert_row(table_name, data):
     col_names = ", ".join(quote_ident(c) for c in data.keys())
     placeholders = ", ".join(["?"] * len(data))
     query = f"INSERT INTO {quote_ident(table_name)} ({col_names}) VALUES ({placeholders})"
-    conn.execute(query, list(data.values()))
-    conn.commit()
+    with write_connection() as conn:
+        conn.execute(query, list(data.values()))
+    bump_table_version(table_name)
+
+# -----------------
+# Partner search
+# -----------------
+
+PARTNER_TABLE = "Main Travel Database"
+PARTNER_SEARCH_TABLE = "_partner_search"
+PARTNER_SEARCH_COLUMNS = ["Partner Name", "Description", "Location", "Country"]
+
+# Guards the derived-table checks. Lock order: _writer_lock, then _search_lock
+_search_lock = threading.Lock()
+# ensure_* name -> (data_version when last checked, result)
+_derived_checks: Dict[str, Tuple[int, bool]] = {}
+
+
+def _last_derived_check(name: str) -> Optional[bool]:
+    """Result of the last check of a derived table, unless the database changed from outside since."""
+    entry = _derived_checks.get(name)
+    if entry is not None and entry[0] == _external_data_version():
+        return entry[1]
+    return None
+
+
+def _create_partner_search_index(conn: sqlite3.Connection) -> None:
+    """(Re)create the FTS5 index over PARTNER_TABLE and its sync triggers."""
+    fts = quote_ident(PARTNER_SEARCH_TABLE)
+    src = quote_ident(PARTNER_TABLE)
+    cols = ", ".join(quote_ident(c) for c in PARTNER_SEARCH_COLUMNS)
+    new_vals = ", ".join(f"new.{quote_ident(c)}" for c in PARTNER_SEARCH_COLUMNS)
+    old_vals = ", ".join(f"old.{quote_ident(c)}" for c in PARTNER_SEARCH_COLUMNS)
+
+    conn.execute(f"DROP TABLE IF EXISTS {fts}")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content={src}, content_rowid='rowid', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {quote_ident(PARTNER_SEARCH_TABLE + '_ai')} AFTER INSERT ON {src} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_vals}); END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {quote_ident(PARTNER_SEARCH_TABLE + '_ad')} AFTER DELETE ON {src} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals}); END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {quote_ident(PARTNER_SEARCH_TABLE + '_au')} AFTER UPDATE ON {src} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_vals}); END"
+    )
+    conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def ensure_partner_search_index() -> bool:
+    """Make sure the FTS index and its triggers exist; returns False if FTS5 is unavailable.
+
+    The check is repeated whenever another process has changed the database
+    (PRAGMA data_version). Replacing the source table (the ingest CLI, the
+    import notebook) drops the triggers, in which case the index is rebuilt.
+    """
+    ready = _last_derived_check("partner_search")
+    if ready is not None:
+        return ready
+    with _writer_lock, _search_lock:
+        version = _external_data_version()
+        trigger_names = [PARTNER_SEARCH_TABLE + suffix for suffix in ("_ai", "_ad", "_au")]
+        try:
+            with write_connection() as conn:
+                cols = get_table_columns(conn, PARTNER_TABLE)["name"].tolist()
+                if not cols or any(c not in cols for c in PARTNER_SEARCH_COLUMNS):
+                    _derived_checks["partner_search"] = (version, False)
+                    return False
+                placeholders = ", ".join(["?"] * len(trigger_names))
+                existing = conn.execute(
+                    f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({placeholders})",
+                    trigger_names,
+                ).fetchone()[0]
+                has_index = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?",
+                    (PARTNER_SEARCH_TABLE,),
+                ).fetchone()
+                if existing < len(trigger_names) or not has_index:
+                    _create_partner_search_index(conn)
+            ready = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: fall back to LIKE scans
+            ready = False
+        _derived_checks["partner_search"] = (version, ready)
+        return ready
+
+
+def _fts_match_expression(keyword: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = re.findall(r"\w+", keyword)
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _partner_search_sql(keyword: str, filters: Optional[Dict[str, Any]]) -> Tuple[str, str, List[Any]]:
+    """Build the FROM/WHERE and ORDER BY clauses shared by search and count."""
+    where = []
+    params: List[Any] = []
+    for col, value in (filters or {}).items():
+        where.append(f"m.{quote_ident(col)} = ?")
+        params.append(value)
+
+    src = quote_ident(PARTNER_TABLE)
+    match = _fts_match_expression(keyword) if keyword else ""
+    if match and ensure_partner_search_index():
+        fts = quote_ident(PARTNER_SEARCH_TABLE)
+        where.insert(0, f"{fts} MATCH ?")
+        params.insert(0, match)
+        from_sql = f"FROM {fts} JOIN {src} m ON m.rowid = {fts}.rowid WHERE {' AND '.join(where)}"
+        return from_sql, f"ORDER BY bm25({fts}), m.rowid", params
+
+    if keyword and keyword.strip():
+        like = " OR ".join(
+            f"instr(lower(m.{quote_ident(c)}), lower(?)) > 0" for c in PARTNER_SEARCH_COLUMNS
+        )
+        where.append(f"({like})")
+        params.extend([keyword] * len(PARTNER_SEARCH_COLUMNS))
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    return f"FROM {src} m{where_sql}", "ORDER BY m.rowid", params
+
+
+def search_partners(
+    keyword: str = "",
+    filters: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> pd.DataFrame:
+    """Return one page of partners matching exact-value filters and an optional keyword.
+
+    With a keyword, rows are ranked by BM25 relevance over
+    PARTNER_SEARCH_COLUMNS; otherwise they keep table order. The frame is
+    indexed by SQLite rowid.
+    """
+    from_sql, order_sql, params = _partner_search_sql(keyword, filters)
+    query = f'SELECT m.rowid AS "__rowid__", m.* {from_sql} {order_sql}'
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params = params + [int(limit), int(offset)]
+    with read_connection() as conn:
+        return pd.read_sql(query, conn, params=params, index_col="__rowid__")
+
+
+def count_partners(keyword: str = "", filters: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
+    """Return (matching rows, distinct partner names) for a search."""
+    from_sql, _, params = _partner_search_sql(keyword, filters)
+    query = f'SELECT COUNT(*), COUNT(DISTINCT m."Partner Name") {from_sql}'
+    with read_connection() as conn:
+        row = conn.execute(query, params).fetchone()
+    return int(row[0]), int(row[1])
+
+
+def get_partner_names(filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """Distinct partner names matching exact-value filters."""
+    where = " AND ".join(f"{quote_ident(c)} = ?" for c in (filters or {}))
+    where_sql = f"WHERE {where}" if where else ""
+    with read_connection() as conn:
+        rows = conn.execute(
+            f'SELECT DISTINCT "Partner Name" FROM {quote_ident(PARTNER_TABLE)} {where_sql}',
+            list((filters or {}).values()),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def get_partner_details(partner_name: str) -> Optional[Dict[str, Any]]:
+    """First Main Travel row for a partner name, or None."""
+    with read_connection() as conn:
+        df = pd.read_sql(
+            f'SELECT * FROM {quote_ident(PARTNER_TABLE)} WHERE "Partner Name" = ? ORDER BY rowid LIMIT 1',
+            conn,
+            params=[partner_name],
+        )
+    return df.iloc[0].to_dict() if not df.empty else None
+
+
+# -----------------
+# Feedback
+# -----------------
+
+FEEDBACK_TABLE = "Feedback Database"
+FEEDBACK_SENTIMENT_TABLE = "_feedback_sentiment"
+
+# (sentiment, priority, keywords) checked in order against the lower-cased
+# "Feedback Type"; the first match wins. Priority sorts good → neutral → bad.
+FEEDBACK_SENTIMENTS = [
+    ("good", 1, ["positive", "good", "excellent", "great", "outstanding"]),
+    ("neutral", 2, ["neutral", "suggestion", "improvement", "general"]),
+    ("bad", 3, ["negative", "bad", "poor", "complaint", "issue"]),
+]
+# Unrecognised types sort with neutral feedback but keep their own badge
+FEEDBACK_OTHER = ("other", 2)
+
+# sentiment -> (symbol, background, text colour, border)
+FEEDBACK_STYLES = {
+    "good": ("✅", "#d4edda", "#155724", "#c3e6cb"),
+    "neutral": ("💡", "#fff3cd", "#856404", "#ffeaa7"),
+    "bad": ("❌", "#f8d7da", "#721c24", "#f5c6cb"),
+    "other": ("📝", "#e2e3e5", "#383d41", "#d6d8db"),
+}
+
+
+def classify_feedback(feedback_types: pd.Series) -> pd.DataFrame:
+    """Vectorized sentiment/priority for a "Feedback Type" column."""
+    lowered = feedback_types.astype(str).str.lower()
+    conditions = [
+        lowered.str.contains("|".join(re.escape(w) for w in words), regex=True).to_numpy()
+        for _, _, words in FEEDBACK_SENTIMENTS
+    ]
+    sentiment = np.select(conditions, [name for name, _, _ in FEEDBACK_SENTIMENTS], default=FEEDBACK_OTHER[0])
+    priority = np.select(conditions, [p for _, p, _ in FEEDBACK_SENTIMENTS], default=FEEDBACK_OTHER[1])
+    return pd.DataFrame({"sentiment": sentiment, "priority": priority}, index=feedback_types.index)
+
+
+def _feedback_case_sql(value_sql: str, field: int) -> str:
+    """SQL CASE mirroring classify_feedback(); field 0 = sentiment, 1 = priority."""
+    whens = []
+    for rule in FEEDBACK_SENTIMENTS:
+        test = " OR ".join(f"instr(lower({value_sql}), '{w}') > 0" for w in rule[2])
+        result = f"'{rule[0]}'" if field == 0 else str(rule[1])
+        whens.append(f"WHEN {test} THEN {result}")
+    default = f"'{FEEDBACK_OTHER[0]}'" if field == 0 else str(FEEDBACK_OTHER[1])
+    return f"CASE {' '.join(whens)} ELSE {default} END"
+
+
+def _create_feedback_sentiment(conn: sqlite3.Connection) -> None:
+    """(Re)build the sentiment side table and the triggers that maintain it."""
+    side = quote_ident(FEEDBACK_SENTIMENT_TABLE)
+    src = quote_ident(FEEDBACK_TABLE)
+    ftype = quote_ident("Feedback Type")
+    for suffix in ("_ai", "_au", "_ad"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {quote_ident(FEEDBACK_SENTIMENT_TABLE + suffix)}")
+    conn.execute(f"DROP TABLE IF EXISTS {side}")
+    conn.execute(
+        f"CREATE TABLE {side} (feedback_rowid INTEGER PRIMARY KEY, sentiment TEXT NOT NULL, priority INTEGER NOT NULL)"
+    )
+    conn.execute(f"CREATE INDEX {quote_ident(FEEDBACK_SENTIMENT_TABLE + '_priority')} ON {side}(priority)")
+
+    upsert = (
+        f"INSERT OR REPLACE INTO {side}(feedback_rowid, sentiment, priority) "
+        f"VALUES (new.rowid, {_feedback_case_sql('new.' + ftype, 0)}, {_feedback_case_sql('new.' + ftype, 1)})"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(FEEDBACK_SENTIMENT_TABLE + '_ai')} AFTER INSERT ON {src} BEGIN {upsert}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(FEEDBACK_SENTIMENT_TABLE + '_au')} AFTER UPDATE ON {src} BEGIN "
+        f"DELETE FROM {side} WHERE feedback_rowid = old.rowid; {upsert}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(FEEDBACK_SENTIMENT_TABLE + '_ad')} AFTER DELETE ON {src} BEGIN "
+        f"DELETE FROM {side} WHERE feedback_rowid = old.rowid; END"
+    )
+
+    # Backfill existing rows with the vectorized classifier
+    existing = pd.read_sql(f"SELECT rowid AS feedback_rowid, {ftype} FROM {src}", conn)
+    labels = classify_feedback(existing["Feedback Type"])
+    conn.executemany(
+        f"INSERT INTO {side}(feedback_rowid, sentiment, priority) VALUES (?, ?, ?)",
+        zip(existing["feedback_rowid"].tolist(), labels["sentiment"].tolist(), labels["priority"].astype(int).tolist()),
+    )
+
+
+def ensure_feedback_sentiment() -> bool:
+    """Make sure the sentiment side table is present and in sync.
+
+    Re-checked whenever another process has changed the database.
+    """
+    ready = _last_derived_check("feedback_sentiment")
+    if ready is not None:
+        return ready
+    with _writer_lock, _search_lock:
+        version = _external_data_version()
+        trigger_names = [FEEDBACK_SENTIMENT_TABLE + suffix for suffix in ("_ai", "_au", "_ad")]
+        with write_connection() as conn:
+            cols = get_table_columns(conn, FEEDBACK_TABLE)["name"].tolist()
+            if "Feedback Type" not in cols:
+                _derived_checks["feedback_sentiment"] = (version, False)
+                return False
+            placeholders = ", ".join(["?"] * len(trigger_names))
+            existing = conn.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({placeholders})",
+                trigger_names,
+            ).fetchone()[0]
+            in_sync = False
+            if existing == len(trigger_names):
+                missing = conn.execute(
+                    f"SELECT COUNT(*) FROM {quote_ident(FEEDBACK_TABLE)} f LEFT JOIN "
+                    f"{quote_ident(FEEDBACK_SENTIMENT_TABLE)} s ON s.feedback_rowid = f.rowid "
+                    "WHERE s.feedback_rowid IS NULL"
+                ).fetchone()[0]
+                in_sync = missing == 0
+            if not in_sync:
+                _create_feedback_sentiment(conn)
+        _derived_checks["feedback_sentiment"] = (version, True)
+        return True
+
+
+def _query_feedback(where_sql: str = "", params: Sequence[Any] = (), order_sql: str = "f.rowid") -> pd.DataFrame:
+    """Feedback rows joined with their sentiment columns, falling back to classifying in pandas."""
+    if ensure_feedback_sentiment():
+        with read_connection() as conn:
+            return pd.read_sql(
+                f"SELECT f.*, s.sentiment, s.priority FROM {quote_ident(FEEDBACK_TABLE)} f "
+                f"LEFT JOIN {quote_ident(FEEDBACK_SENTIMENT_TABLE)} s ON s.feedback_rowid = f.rowid "
+                f"{where_sql} ORDER BY {order_sql}",
+                conn,
+                params=list(params),
+            )
+    with read_connection() as conn:
+        df = pd.read_sql(f"SELECT f.* FROM {quote_ident(FEEDBACK_TABLE)} f {where_sql} ORDER BY f.rowid", conn, params=list(params))
+    if "Feedback Type" not in df.columns:
+        return df.assign(sentiment=FEEDBACK_OTHER[0], priority=FEEDBACK_OTHER[1])
+    return df.join(classify_feedback(df["Feedback Type"]))
+
+
+def _load_feedback() -> pd.DataFrame:
+    return _query_feedback()
+
+
+def get_partner_feedback(partner_name: str) -> pd.DataFrame:
+    """One partner's feedback, sorted good → neutral → bad (uses the Partner Name index)."""
+    df = _query_feedback('WHERE f."Partner Name" = ?', [partner_name], "s.priority, f.rowid")
+    return df.sort_values("priority", kind="stable")
+
+
+def load_feedback() -> pd.DataFrame:
+    """Feedback Database rows with their precomputed sentiment and priority columns.
+
+    Shared between sessions like load_table(); treat as read-only.
+    """
+    return cached_derived("feedback_with_sentiment", [FEEDBACK_TABLE], _load_feedback)
+
+
+def feedback_badge_html(sentiment: str, feedback_type: Any) -> str:
+    """Badge markup for unsafe_allow_html; feedback_type is user-editable and is escaped."""
+    symbol, background, color, border = FEEDBACK_STYLES.get(sentiment, FEEDBACK_STYLES["other"])
+    return (
+        f"<div style='background-color: {background}; color: {color}; padding: 8px 12px; "
+        f"border-radius: 6px; border: 1px solid {border}; font-weight: bold;'>{symbol} {html.escape(str(feedback_type))}</div>"
+    )
+
+
+def _build_feedback_index() -> Dict[Any, Dict[str, Any]]:
+    df = load_feedback()
+    if "Partner ID" not in df.columns:
+        return {}
+    df = df.sort_values("priority", kind="stable")
+
+    index: Dict[Any, Dict[str, Any]] = {}
+    for partner_id, rows in df.groupby("Partner ID", sort=False):
+        counts = rows["priority"].value_counts()
+        index[partner_id] = {
+            "rows": rows,
+            "good": int(counts.get(1, 0)),
+            "neutral": int(counts.get(2, 0)),
+            "bad": int(counts.get(3, 0)),
+        }
+    return index
+
+
+def get_feedback_by_partner() -> Dict[Any, Dict[str, Any]]:
+    """Map Partner ID to its feedback rows (sorted good → bad) and counts.
+
+    Built once per Feedback Database version and shared by every session.
+    """
+    return cached_derived("feedback_by_partner", [FEEDBACK_TABLE], _build_feedback_index)
+
+
+# -----------------
+# Facet index
+# -----------------
+# For every facet column, value counts of that column under every combination
+# of selections in the other facet columns, so a dropdown's options for the
+# current selections are a single dict lookup.
+
+def build_facet_index(df: pd.DataFrame, columns: Sequence[str]) -> Dict[str, Any]:
+    """Precompute option counts for each facet column given any selection of the others."""
+    columns = [c for c in columns if c in df.columns]
+    options: Dict[str, Dict[frozenset, Dict[Any, int]]] = {}
+    for target in columns:
+        others = [c for c in columns if c != target]
+        rows = df[df[target].notna()]
+        by_selection: Dict[frozenset, Dict[Any, int]] = {}
+        for size in range(len(others) + 1):
+            for combo in itertools.combinations(others, size):
+                counts = rows.groupby(list(combo) + [target], dropna=True, sort=False).size()
+                for key, count in counts.items():
+                    key = key if isinstance(key, tuple) else (key,)
+                    selection = frozenset(zip(combo, key[:-1]))
+                    by_selection.setdefault(selection, {})[key[-1]] = int(count)
+        options[target] = {
+            selection: dict(sorted(values.items(), key=lambda item: str(item[0])))
+            for selection, values in by_selection.items()
+        }
+    return {"columns": columns, "options": options, "rows": len(df)}
+
+
+def get_facet_index(table_name: str, columns: Sequence[str]) -> Dict[str, Any]:
+    """Facet index over a stored table, rebuilt only when the table changes."""
+    return cached_derived(
+        f"facets:{table_name}:{'|'.join(columns)}",
+        [table_name],
+        lambda: build_facet_index(load_table(table_name), columns),
+    )
+
+
+def facet_options(index: Dict[str, Any], column: str, selections: Dict[str, Any]) -> Dict[Any, int]:
+    """Values of column (with row counts) that match the other selected facets.
+
+    selections maps facet column to its selected value; None means no filter.
+    """
+    key = frozenset(
+        (c, v) for c, v in selections.items()
+        if c != column and c in index["columns"] and v is not None
+    )
+    return index["options"].get(column, {}).get(key, {})
+
+
+def facet_label(counts: Dict[Any, int]) -> Callable[[Any], str]:
+    """format_func for a selectbox whose options are facet values plus an "All ..." entry."""
+    return lambda value: f"{value} ({counts[value]})" if value in counts else str(value)
+
+
+# -----------------
+# Services enrichment
+# -----------------
+# _services_enriched holds, per service row, its trimmed partner keys and the
+# Country/Location of the matching Main Travel partner (by Partner ID, falling
+# back to Partner Name). Triggers on both tables keep it current, so the
+# Services page is a single indexed query.
+
+SERVICE_TABLE = "Service Database"
+# One row per tour and pax tier; read by tour_pricing and tour_availability
+TOUR_TABLE = "MYA Tour Database"
+SERVICES_ENRICHED_TABLE = "_services_enriched"
+SERVICES_ENRICHED_TRIGGERS = ("_service_ai", "_service_au", "_service_ad", "_main_ai", "_main_au", "_main_ad")
+
+
+def _partner_lookup_sql(column: str, id_sql: str, name_sql: str) -> str:
+    """Main Travel column of the first partner matching by trimmed ID, else by trimmed name."""
+    main = quote_ident(PARTNER_TABLE)
+    col = quote_ident(column)
+    return (
+        f'COALESCE((SELECT m.{col} FROM {main} m WHERE trim(m."Partner ID") = {id_sql} ORDER BY m.rowid LIMIT 1), '
+        f'(SELECT m.{col} FROM {main} m WHERE trim(m."Partner Name") = {name_sql} ORDER BY m.rowid LIMIT 1))'
+    )
+
+
+def _create_services_enriched(conn: sqlite3.Connection) -> None:
+    """(Re)build the enriched services table, its indexes and maintenance triggers."""
+    side = quote_ident(SERVICES_ENRICHED_TABLE)
+    services = quote_ident(SERVICE_TABLE)
+    main = quote_ident(PARTNER_TABLE)
+    for suffix in SERVICES_ENRICHED_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {quote_ident(SERVICES_ENRICHED_TABLE + suffix)}")
+    conn.execute(f"DROP TABLE IF EXISTS {side}")
+    conn.execute(
+        f"CREATE TABLE {side} (service_rowid INTEGER PRIMARY KEY, partner_id TEXT, partner_name TEXT, "
+        "country TEXT, location TEXT)"
+    )
+    for name, cols in [("partner_id", "partner_id"), ("partner_name", "partner_name"), ("place", "country, location")]:
+        conn.execute(f"CREATE INDEX {quote_ident(SERVICES_ENRICHED_TABLE + '_' + name)} ON {side}({cols})")
+    # Expression indexes so the trimmed-key lookups into Main Travel are not scans
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_main_travel_database__trim_partner_id" ON {main}(trim("Partner ID"))')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_main_travel_database__trim_partner_name" ON {main}(trim("Partner Name"))')
+
+    def enriched_row(ref: str) -> str:
+        pid, pname = f'trim({ref}."Partner ID")', f'trim({ref}."Partner Name")'
+        return (
+            f"SELECT {ref}.rowid, {pid}, {pname}, "
+            f"{_partner_lookup_sql('Country', pid, pname)}, {_partner_lookup_sql('Location', pid, pname)}"
+        )
+
+    insert = f"INSERT OR REPLACE INTO {side}(service_rowid, partner_id, partner_name, country, location) "
+    prefix = SERVICES_ENRICHED_TABLE
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_service_ai')} AFTER INSERT ON {services} BEGIN "
+        f"{insert}{enriched_row('new')}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_service_au')} AFTER UPDATE ON {services} BEGIN "
+        f"DELETE FROM {side} WHERE service_rowid = old.rowid; {insert}{enriched_row('new')}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_service_ad')} AFTER DELETE ON {services} BEGIN "
+        f"DELETE FROM {side} WHERE service_rowid = old.rowid; END"
+    )
+
+    # A partner change re-resolves only the services keyed on its old or new ID/name
+    refresh = (
+        f"UPDATE {side} SET country = {_partner_lookup_sql('Country', 'partner_id', 'partner_name')}, "
+        f"location = {_partner_lookup_sql('Location', 'partner_id', 'partner_name')} WHERE "
+    )
+    def touched(*refs: str) -> str:
+        ids = ", ".join(f'trim({r}."Partner ID")' for r in refs)
+        names = ", ".join(f'trim({r}."Partner Name")' for r in refs)
+        return f"partner_id IN ({ids}) OR partner_name IN ({names})"
+
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_main_ai')} AFTER INSERT ON {main} BEGIN "
+        f"{refresh}{touched('new')}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_main_au')} AFTER UPDATE ON {main} BEGIN "
+        f"{refresh}{touched('old', 'new')}; END"
+    )
+    conn.execute(
+        f"CREATE TRIGGER {quote_ident(prefix + '_main_ad')} AFTER DELETE ON {main} BEGIN "
+        f"{refresh}{touched('old')}; END"
+    )
+
+    conn.execute(f"{insert}{enriched_row('s')} FROM {services} s")
+
+
+def ensure_services_enriched() -> bool:
+    """Make sure _services_enriched and its triggers exist and are in sync.
+
+    Re-checked whenever another process has changed the database. Returns
+    False when either source table lacks the key columns.
+    """
+    ready = _last_derived_check("services_enriched")
+    if ready is not None:
+        return ready
+    with _writer_lock, _search_lock:
+        version = _external_data_version()
+        trigger_names = [SERVICES_ENRICHED_TABLE + suffix for suffix in SERVICES_ENRICHED_TRIGGERS]
+        with write_connection() as conn:
+            service_cols = get_table_columns(conn, SERVICE_TABLE)["name"].tolist()
+            main_cols = get_table_columns(conn, PARTNER_TABLE)["name"].tolist()
+            required = ["Partner ID", "Partner Name"]
+            if any(c not in service_cols for c in required) or any(
+                c not in main_cols for c in required + ["Country", "Location"]
+            ):
+                _derived_checks["services_enriched"] = (version, False)
+                return False
+            placeholders = ", ".join(["?"] * len(trigger_names))
+            existing = conn.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({placeholders})",
+                trigger_names,
+            ).fetchone()[0]
+            in_sync = False
+            if existing == len(trigger_names):
+                counts = conn.execute(
+                    f"SELECT (SELECT COUNT(*) FROM {quote_ident(SERVICE_TABLE)}), "
+                    f"(SELECT COUNT(*) FROM {quote_ident(SERVICES_ENRICHED_TABLE)})"
+                ).fetchone()
+                in_sync = counts[0] == counts[1]
+            if not in_sync:
+                _create_services_enriched(conn)
+        _derived_checks["services_enriched"] = (version, True)
+        return True
+
+
+def reset_derived_tables() -> None:
+    """Forget the derived-table checks so the next ensure_* call re-verifies.
+
+    Needed after this process replaces a source table, which drops its
+    triggers without moving this process's data_version.
+    """
+    with _writer_lock, _search_lock:
+        _derived_checks.clear()
+
+
+def query_services(
+    country: Optional[str] = None,
+    location: Optional[str] = None,
+    name_search: str = "",
+) -> pd.DataFrame:
+    """Services with trimmed partner keys plus partner Country/Location.
+
+    Filters run in SQLite against the indexed enrichment table; rows without a
+    partner name are left out. The frame is indexed by service rowid.
+    """
+    with read_connection() as conn:
+        cols = get_table_columns(conn, SERVICE_TABLE)["name"].tolist()
+    if not ensure_services_enriched():
+        with read_connection() as conn:
+            df = pd.read_sql(f'SELECT rowid AS "{ROWID_COLUMN}", * FROM {quote_ident(SERVICE_TABLE)}', conn)
+        return df.assign(Country=None, Location=None).set_index(ROWID_COLUMN)
+
+    select = []
+    for c in cols:
+        if c == "Partner ID":
+            select.append('e.partner_id AS "Partner ID"')
+        elif c == "Partner Name":
+            select.append('e.partner_name AS "Partner Name"')
+        elif c not in ("Country", "Location"):
+            select.append(f"s.{quote_ident(c)}")
+    select += ['e.country AS "Country"', 'e.location AS "Location"']
+
+    where = ["e.partner_name IS NOT NULL", "e.partner_name <> ''"]
+    params: List[Any] = []
+    if country is not None:
+        where.append("e.country = ?")
+        params.append(country)
+    if location is not None:
+        where.append("e.location = ?")
+        params.append(location)
+    if name_search:
+        where.append("instr(lower(e.partner_name), lower(?)) > 0")
+        params.append(name_search)
+    query = (
+        f'SELECT e.service_rowid AS "{ROWID_COLUMN}", {", ".join(select)} '
+        f"FROM {quote_ident(SERVICES_ENRICHED_TABLE)} e JOIN {quote_ident(SERVICE_TABLE)} s ON s.rowid = e.service_rowid "
+        f"WHERE {' AND '.join(where)} ORDER BY e.service_rowid"
+    )
+    with read_connection() as conn:
+        return pd.read_sql(query, conn, params=params).set_index(ROWID_COLUMN)
+
+
+SERVICE_DATE_COLUMNS = {"Date of Service": "__dos", "Date Quotation": "__dq"}
+
+
+def _parse_service_dates() -> pd.DataFrame:
+    with read_connection() as conn:
+        cols = [c for c in SERVICE_DATE_COLUMNS if c in get_table_columns(conn, SERVICE_TABLE)["name"].tolist()]
+        select = ", ".join([f'rowid AS "{ROWID_COLUMN}"'] + [quote_ident(c) for c in cols])
+        df = pd.read_sql(f"SELECT {select} FROM {quote_ident(SERVICE_TABLE)}", conn).set_index(ROWID_COLUMN)
+    return pd.DataFrame(
+        {SERVICE_DATE_COLUMNS[c]: pd.to_datetime(df[c], errors="coerce") for c in cols},
+        index=df.index,
+    )
+
+
+def order_services(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort query_services() rows by partner, then most recent service first.
+
+    Dates are parsed once per Service Database version and joined on rowid
+    as __dos / __dq; the partner key (Partner ID, else name) is __partner.
+    """
+    dates = cached_derived("service_dates", [SERVICE_TABLE], _parse_service_dates)
+    df = df.join(dates)
+    partner = df["Partner ID"] if "Partner ID" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    if "Partner Name" in df.columns:
+        partner = partner.fillna(df["Partner Name"])
+    df["__partner"] = partner
+    sort_cols = ["__partner"] + [c for c in SERVICE_DATE_COLUMNS.values() if c in df.columns]
+    return df.sort_values(
+        sort_cols,
+        ascending=[True] + [False] * (len(sort_cols) - 1),
+        na_position="last",
+        kind="stable",
+    )
+
+
+def _services_facets() -> Dict[str, Any]:
+    if ensure_services_enriched():
+        with read_connection() as conn:
+            df = pd.read_sql(
+                f'SELECT country AS "Country", location AS "Location" FROM {quote_ident(SERVICES_ENRICHED_TABLE)}',
+                conn,
+            )
+    else:
+        df = pd.DataFrame(columns=["Country", "Location"])
+    return build_facet_index(df, ["Country", "Location"])
+
+
+def get_services_facets() -> Dict[str, Any]:
+    """Country/Location facet index over the enriched services."""
+    return cached_derived("services_facets", [SERVICE_TABLE, PARTNER_TABLE], _services_facets)
+
+
+# -----------------
+# Table editing
+# -----------------
+
+def _window_where(filter_column: Optional[str], filter_text: str) -> Tuple[str, List[Any]]:
+    if filter_column and filter_text:
+        return (
+            f" WHERE instr(lower(CAST({quote_ident(filter_column)} AS TEXT)), lower(?)) > 0",
+            [filter_text],
+        )
+    return "", []
+
+
+def count_table_rows(table_name: str, filter_column: Optional[str] = None, filter_text: str = "") -> int:
+    where_sql, params = _window_where(filter_column, filter_text)
+    with read_connection() as conn:
+        row = conn.execute(f"SELECT COUNT(*) FROM {quote_ident(table_name)}{where_sql}", params).fetchone()
+    return int(row[0]) if row else 0
+
+
+def fetch_table_window(
+    table_name: str,
+    limit: int,
+    offset: int = 0,
+    sort_by: Optional[str] = None,
+    descending: bool = False,
+    filter_column: Optional[str] = None,
+    filter_text: str = "",
+) -> pd.DataFrame:
+    """Fetch a slice of a table for editing, sorted and filtered in SQLite.
+
+    The rowid is returned as the first column, ROWID_COLUMN, so edits can be
+    written back to exactly the rows they came from.
+    """
+    where_sql, params = _window_where(filter_column, filter_text)
+    order_sql = "ORDER BY "
+    if sort_by:
+        order_sql += f"{quote_ident(sort_by)} {'DESC' if descending else 'ASC'}, "
+    order_sql += "rowid"
+    query = (
+        f"SELECT rowid AS {quote_ident(ROWID_COLUMN)}, * FROM {quote_ident(table_name)}"
+        f"{where_sql} {order_sql} LIMIT ? OFFSET ?"
+    )
+    with read_connection() as conn:
+        return pd.read_sql(query, conn, params=params + [int(limit), int(offset)])
+
+
+def editor_has_edits(editor_state: Any) -> bool:
+    """True if a data_editor's session state holds edited, added or deleted rows."""
+    if not isinstance(editor_state, dict):
+        return False
+    return any(editor_state.get(k) for k in ("edited_rows", "added_rows", "deleted_rows"))
+
+
+def get_column_values(table_name: str, column: str) -> List[Any]:
+    """Distinct non-null values of a column, sorted."""
+    col = quote_ident(column)
+    with read_connection() as conn:
+        rows = conn.execute(
+            f"SELECT DISTINCT {col} FROM {quote_ident(table_name)} WHERE {col} IS NOT NULL ORDER BY {col}"
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def diff_frames(original: pd.DataFrame, edited: pd.DataFrame, key: Optional[str] = None) -> Dict[str, Any]:
+    """Compare an edited frame with its snapshot.
+
+    Rows are matched on the `key` column when given (edited rows with an
+    empty key count as new), otherwise by index label. Returns a changeset:
+      - "updated": {label: [changed column names]} for rows present in both
+      - "inserted": new rows from `edited` (without the key column)
+      - "deleted": labels of `original` that are missing from `edited`
+    Missing values (None/NaN) on both sides compare equal.
+    """
+    if key is not None:
+        new_mask = edited[key].isna()
+        inserted = edited.loc[new_mask].drop(columns=[key])
+        edited = edited.loc[~new_mask].astype({key: "int64"}).set_index(key)
+        original = original.set_index(key)
+    else:
+        inserted = edited.loc[~edited.index.isin(original.index)]
+
+    cols = [c for c in edited.columns if c in original.columns]
+    common = original.index[original.index.isin(edited.index)]
+    before = original.loc[common, cols]
+    after = edited.loc[common, cols]
+
+    changed = before.ne(after) & ~(before.isna() & after.isna())
+    changed_rows = changed.any(axis=1).to_numpy()
+    col_array = pd.Index(cols)
+    updated = {
+        label: col_array[mask].tolist()
+        for label, mask in zip(common[changed_rows], changed.to_numpy()[changed_rows])
+    }
+
+    return {
+        "updated": updated,
+        "inserted": inserted,
+        "deleted": original.index[~original.index.isin(edited.index)].tolist(),
+    }
+
+
+def _sql_value(value: Any) -> Any:
+    """Convert a pandas/numpy cell value into something sqlite3 can bind."""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return str(value)
+    if hasattr(value, "item"):
+        value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+    return value
+
+
+def _primary_key(conn: sqlite3.Connection, table_name: str) -> Optional[str]:
+    columns_info = get_table_columns(conn, table_name)
+    pk_rows = columns_info[columns_info["pk"] == 1]
+    return pk_rows["name"].iloc[0] if not pk_rows.empty else None
+
+
+def save_changeset(table_name: str, edited: pd.DataFrame, changeset: Dict[str, Any]) -> Dict[str, int]:
+    """Write a rowid-keyed diff_frames() changeset back in one transaction.
+
+    Updated rows are grouped by the set of columns that changed and each group
+    is sent with a single executemany that only writes those columns. Updates
+    and deletes target rows by rowid, so duplicate business keys are never
+    touched by someone else's edit.
+    """
+    table = quote_ident(table_name)
+    counts = {"updated": 0, "inserted": 0, "deleted": 0}
+    existing = edited.dropna(subset=[ROWID_COLUMN]).astype({ROWID_COLUMN: "int64"}).set_index(ROWID_COLUMN)
+    with write_connection() as conn:
+        groups: Dict[Tuple[str, ...], List[Any]] = {}
+        for rowid, changed_cols in changeset["updated"].items():
+            groups.setdefault(tuple(changed_cols), []).append(rowid)
+        for cols, rowids in groups.items():
+            set_clause = ", ".join(f"{quote_ident(c)} = ?" for c in cols)
+            values = existing.loc[rowids, list(cols)].to_numpy(dtype=object)
+            params = [
+                [_sql_value(v) for v in row] + [int(rowid)]
+                for row, rowid in zip(values, rowids)
+            ]
+            conn.executemany(f"UPDATE {table} SET {set_clause} WHERE rowid = ?", params)
+            counts["updated"] += len(params)
+
+        if changeset["deleted"]:
+            conn.executemany(
+                f"DELETE FROM {table} WHERE rowid = ?",
+                [(int(rowid),) for rowid in changeset["deleted"]],
+            )
+            counts["deleted"] = len(changeset["deleted"])
+
+        new_rows = changeset["inserted"]
+        if not new_rows.empty:
+            pk_column = _primary_key(conn, table_name)
+            # Skip rows whose declared primary key was left empty
+            if pk_column and pk_column in new_rows.columns:
+                pk_values = new_rows[pk_column]
+                new_rows = new_rows[pk_values.notna() & (pk_values.astype(str) != "")]
+            table_columns = get_table_columns(conn, table_name)["name"].tolist()
+            columns = [c for c in new_rows.columns if c in table_columns]
+            placeholders = ", ".join(["?"] * len(columns))
+            columns_str = ", ".join(quote_ident(c) for c in columns)
+            params = [
+                [_sql_value(v) for v in row]
+                for row in new_rows[columns].to_numpy(dtype=object)
+            ]
+            conn.executemany(
+                f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})",
+                params,
+            )
+            counts["inserted"] = len(params)
+    bump_table_version(table_name)
+    return counts
+
 
 def init_session_state():
     defaults = {
         "selected_table": None,
         "selected_supplier": None,
         "auth_user": None,
+        "auth_session_id": None,
+        "auth_checked_at": 0.0,
+        "auth_expires_at": 0,
+        # Cookie value to write on the next render ("" clears it)
+        "auth_cookie_pending": None,
+        # Signed out in this browser session; ignore the cookie seen at connect time
+        "auth_signed_out": False,
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+# -----------------
+# Session memory
+# -----------------
+
+# Budgets for editor snapshots, configurable in MB through the environment
+SESSION_SNAPSHOT_BUDGET_BYTES = int(float(os.environ.get("MYA_SESSION_SNAPSHOT_BUDGET_MB", "64")) * 1024 * 1024)
+TOTAL_SNAPSHOT_BUDGET_BYTES = int(float(os.environ.get("MYA_TOTAL_SNAPSHOT_BUDGET_MB", "512")) * 1024 * 1024)
+# Snapshots of sessions idle for longer than this are dropped
+SESSION_IDLE_SECONDS = 30 * 60
+# A session's session_state is measured at most this often (or when a snapshot is stored)
+SESSION_TRACK_SECONDS = 60
+
+_snapshot_lock = threading.Lock()
+# (session_id, key) -> (frame, bytes), least recently used first
+_snapshots: "OrderedDict[Tuple[str, str], Tuple[pd.DataFrame, int]]" = OrderedDict()
+# session_id -> {"user", "last_seen", "last_measured", "state_bytes": {key: bytes}}
+_session_usage: Dict[str, Dict[str, Any]] = {}
+_evictions = {"count": 0, "bytes": 0}
+
+
+def _current_session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:
+        ctx = None
+    return ctx.session_id if ctx is not None else "default"
+
+
+def _estimate_bytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+
+def _evict_snapshot(snapshot_key: Tuple[str, str]) -> None:
+    """Drop one snapshot; callers must hold _snapshot_lock."""
+    _, nbytes = _snapshots.pop(snapshot_key)
+    _evictions["count"] += 1
+    _evictions["bytes"] += nbytes
+
+
+def _enforce_snapshot_budget(session_id: str, keep: Tuple[str, str]) -> None:
+    """Evict least recently used snapshots until both budgets hold; callers must hold _snapshot_lock."""
+    session_bytes = sum(b for (sid, _), (_, b) in _snapshots.items() if sid == session_id)
+    for key in list(_snapshots):
+        if session_bytes <= SESSION_SNAPSHOT_BUDGET_BYTES:
+            break
+        if key[0] == session_id and key != keep:
+            session_bytes -= _snapshots[key][1]
+            _evict_snapshot(key)
+
+    total_bytes = sum(b for _, b in _snapshots.values())
+    for key in list(_snapshots):
+        if total_bytes <= TOTAL_SNAPSHOT_BUDGET_BYTES:
+            break
+        if key != keep:
+            total_bytes -= _snapshots[key][1]
+            _evict_snapshot(key)
+
+
+def put_snapshot(key: str, df: pd.DataFrame) -> None:
+    """Store an editor snapshot for the current session under the memory budget."""
+    session_id = _current_session_id()
+    snapshot_key = (session_id, key)
+    track_session_memory(force=True)
+    with _snapshot_lock:
+        _snapshots[snapshot_key] = (df, _estimate_bytes(df))
+        _snapshots.move_to_end(snapshot_key)
+        _enforce_snapshot_budget(session_id, snapshot_key)
+
+
+def get_snapshot(key: str) -> Optional[pd.DataFrame]:
+    """Return the current session's snapshot, or None if it was never stored or was evicted."""
+    snapshot_key = (_current_session_id(), key)
+    with _snapshot_lock:
+        entry = _snapshots.get(snapshot_key)
+        if entry is None:
+            return None
+        _snapshots.move_to_end(snapshot_key)
+        return entry[0]
+
+
+def drop_snapshots(prefix: str = "") -> None:
+    """Forget the current session's snapshots whose key starts with prefix."""
+    session_id = _current_session_id()
+    with _snapshot_lock:
+        for key in [k for k in _snapshots if k[0] == session_id and k[1].startswith(prefix)]:
+            del _snapshots[key]
+
+
+def track_session_memory(force: bool = False) -> None:
+    """Record the current session's activity and per-key session_state size.
+
+    Measuring session_state and sweeping idle sessions is throttled to once
+    per SESSION_TRACK_SECONDS per session unless forced (put_snapshot does).
+    """
+    session_id = _current_session_id()
+    now = time.time()
+    with _snapshot_lock:
+        info = _session_usage.get(session_id)
+        if info is not None and not force and now - info["last_measured"] < SESSION_TRACK_SECONDS:
+            info["last_seen"] = now
+            return
+    user = st.session_state.get("auth_user")
+    state_bytes = {str(k): _estimate_bytes(v) for k, v in st.session_state.items()}
+    with _snapshot_lock:
+        _session_usage[session_id] = {
+            "user": user.get("username") if user else None,
+            "last_seen": now,
+            "last_measured": now,
+            "state_bytes": state_bytes,
+        }
+        # Forget sessions that have been idle for a long time along with their snapshots
+        cutoff = now - SESSION_IDLE_SECONDS
+        for sid in [sid for sid, info in _session_usage.items() if info["last_seen"] < cutoff]:
+            del _session_usage[sid]
+            for key in [k for k in _snapshots if k[0] == sid]:
+                _evict_snapshot(key)
+
+
+def get_session_memory_report() -> Dict[str, Any]:
+    """Per-session and per-key memory held in session state and editor snapshots."""
+    with _snapshot_lock:
+        sessions = []
+        for sid, info in _session_usage.items():
+            snapshot_bytes = {k: b for (s_id, k), (_, b) in _snapshots.items() if s_id == sid}
+            sessions.append({
+                "session": sid[:8],
+                "user": info["user"],
+                "idle_seconds": int(time.time() - info["last_seen"]),
+                "snapshots": len(snapshot_bytes),
+                "snapshot_bytes": sum(snapshot_bytes.values()),
+                "state_bytes": sum(info["state_bytes"].values()),
+                "keys": {**info["state_bytes"], **snapshot_bytes},
+            })
+        return {
+            "sessions": sessions,
+            "snapshot_bytes": sum(b for _, b in _snapshots.values()),
+            "state_bytes": sum(s["state_bytes"] for s in sessions),
+            "session_budget_bytes": SESSION_SNAPSHOT_BUDGET_BYTES,
+            "total_budget_bytes": TOTAL_SNAPSHOT_BUDGET_BYTES,
+            "evictions": _evictions["count"],
+            "evicted_bytes": _evictions["bytes"],
+        }
+
+
 # -----------------
 # Authentication
 # -----------------
 
+# PBKDF2 runs on a small shared pool instead of each session's script thread,
+# so a burst of sign-ins cannot use more than HASH_WORKERS cores; at most
+# HASH_QUEUE_LIMIT further hashes may wait before sign-ins are turned away.
+HASH_WORKERS = max(1, int(os.environ.get("MYA_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))))
+HASH_QUEUE_LIMIT = int(os.environ.get("MYA_HASH_QUEUE_LIMIT", "32"))
+# Sliding-window limits checked before any hashing is done
+LOGIN_WINDOW_SECONDS = 5 * 60
+MAX_FAILURES_PER_USER = int(os.environ.get("MYA_MAX_FAILURES_PER_USER", "5"))
+MAX_FAILURES_PER_IP = int(os.environ.get("MYA_MAX_FAILURES_PER_IP", "30"))
+# Reverse proxies in front of the app that append to X-Forwarded-For; the
+# header is client-controlled and ignored unless this is set
+TRUSTED_PROXY_HOPS = int(os.environ.get("MYA_TRUSTED_PROXY_HOPS", "0"))
+HASH_TIMING_SAMPLES = 500
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pwhash")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+_auth_lock = threading.Lock()
+# (kind, value) -> timestamps of recent failures, per user and per address
+_login_attempts: Dict[Tuple[str, str], "deque[float]"] = {}
+# Most recent (queue wait, hash time) pairs in seconds
+_hash_timings: "deque[Tuple[float, float]]" = deque(maxlen=HASH_TIMING_SAMPLES)
+_auth_counters = {"hashes": 0, "throttled_user": 0, "throttled_ip": 0, "busy": 0, "legacy_upgrades": 0}
+
+
+class LoginThrottledError(ValueError):
+    """Sign-in refused before checking the password; retry_after is in seconds."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _run_hash(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a password hashing function on the hash pool and wait for it."""
+    if not _hash_slots.acquire(blocking=False):
+        with _auth_lock:
+            _auth_counters["busy"] += 1
+        raise LoginThrottledError("The server is busy signing other users in. Please try again shortly.", 5.0)
+    queued = time.perf_counter()
+
+    def timed() -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with _auth_lock:
+                _auth_counters["hashes"] += 1
+                _hash_timings.append((started - queued, finished - started))
+
+    try:
+        return _hash_executor.submit(timed).result()
+    finally:
+        _hash_slots.release()
+
+
+def _recent_attempts(kind: str, value: str, now: float) -> "deque[float]":
+    # Caller holds _auth_lock
+    attempts = _login_attempts.setdefault((kind, value), deque())
+    while attempts and attempts[0] <= now - LOGIN_WINDOW_SECONDS:
+        attempts.popleft()
+    return attempts
+
+
+def _check_login_allowed(username: str, client_ip: Optional[str]) -> None:
+    """Raise LoginThrottledError if the user or address has too many recent failures."""
+    now = time.time()
+    with _auth_lock:
+        failures = _recent_attempts("user", username.lower(), now)
+        if len(failures) >= MAX_FAILURES_PER_USER:
+            _auth_counters["throttled_user"] += 1
+            raise LoginThrottledError(
+                "Too many failed sign-ins for this user. Please try again later.",
+                failures[0] + LOGIN_WINDOW_SECONDS - now,
+            )
+        if client_ip:
+            # Only failures count, so many users signing in behind one NAT do not lock each other out
+            ip_failures = _recent_attempts("ip", client_ip, now)
+            if len(ip_failures) >= MAX_FAILURES_PER_IP:
+                _auth_counters["throttled_ip"] += 1
+                raise LoginThrottledError(
+                    "Too many failed sign-ins from this address. Please try again later.",
+                    ip_failures[0] + LOGIN_WINDOW_SECONDS - now,
+                )
+        # Prune idle keys so the table stays bounded
+        if len(_login_attempts) > 10_000:
+            for key in [k for k, v in _login_attempts.items() if not v]:
+                del _login_attempts[key]
+
+
+def _record_login_result(username: str, success: bool, client_ip: Optional[str] = None) -> None:
+    now = time.time()
+    with _auth_lock:
+        if success:
+            # Address failures are kept: a valid account must not reset another's guesses
+            _login_attempts.pop(("user", username.lower()), None)
+            return
+        _recent_attempts("user", username.lower(), now).append(now)
+        if client_ip:
+            _recent_attempts("ip", client_ip, now).append(now)
+
+
+def _forwarded_client_ip(ip_address: Optional[str], headers: Any) -> Optional[str]:
+    """Client address given the socket peer and the request headers.
+
+    With TRUSTED_PROXY_HOPS proxies in front, the client is the entry the
+    outermost trusted proxy appended to X-Forwarded-For, counted from the
+    right; entries further left are whatever the client sent. Without
+    trusted proxies the header is ignored.
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [p.strip() for p in ((headers or {}).get("X-Forwarded-For") or "").split(",") if p.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return ip_address or None
+
+
+def _client_ip() -> Optional[str]:
+    """Best-effort address of the current browser session (None if unknown)."""
+    try:
+        context = st.context
+        return _forwarded_client_ip(getattr(context, "ip_address", None), getattr(context, "headers", None))
+    except Exception:
+        return None
+
+
+def get_auth_stats() -> Dict[str, Any]:
+    """Hash pool latency (milliseconds) and throttling counters for diagnostics."""
+    with _auth_lock:
+        timings = list(_hash_timings)
+        counters = dict(_auth_counters)
+    waits = np.array([t[0] for t in timings]) * 1000
+    hashes = np.array([t[1] for t in timings]) * 1000
+    stats: Dict[str, Any] = dict(counters, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT, samples=len(timings))
+    for name, values in (("hash_ms", hashes), ("wait_ms", waits)):
+        stats[name] = {
+            "p50": float(np.percentile(values, 50)) if len(values) else 0.0,
+            "p95": float(np.percentile(values, 95)) if len(values) else 0.0,
+            "max": float(values.max()) if len(values) else 0.0,
+        }
+    return stats
+
+
 def _hash_password(raw_password: str, *, iterations: int = 200_000) -> str:
     """Return a salted PBKDF2 hash string: pbkdf2$<iterations>$<salt_hex>$<hash_hex>"""
     if raw_password is None:
@@ -68,81 +1423,343 @@ def _verify_password(raw_password: str, stored_value: str) -> bool:
     return hmac.compare_digest(legacy, stored_value)
 
 
+USERS_TABLE = "Users"
+
+_users_table_lock = threading.Lock()
+_users_table_ready = False
+
+
 def ensure_users_table() -> None:
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Users (
-                username TEXT PRIMARY KEY,
-                password_hash TEXT NOT NULL,
-                full_name TEXT,
-                role TEXT DEFAULT 'viewer'
+    """Create the Users table (and role column) once per process."""
+    global _users_table_ready
+    if _users_table_ready:
+        return
+    with _users_table_lock:
+        if _users_table_ready:
+            return
+        with write_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Users (
+                    username TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL,
+                    full_name TEXT,
+                    role TEXT DEFAULT 'viewer'
+                )
+                """
             )
-            """
-        )
-        conn.commit()
-        # Ensure 'role' column exists for older schemas
-        cols = pd.read_sql("PRAGMA table_info(Users)", conn)
-        if "role" not in cols["name"].tolist():
-            conn.execute("ALTER TABLE Users ADD COLUMN role TEXT DEFAULT 'viewer'")
-            conn.commit()
-    finally:
-        conn.close()
+            # Ensure 'role' column exists for older schemas
+            cols = pd.read_sql("PRAGMA table_info(Users)", conn)
+            if "role" not in cols["name"].tolist():
+                conn.execute("ALTER TABLE Users ADD COLUMN role TEXT DEFAULT 'viewer'")
+        _users_table_ready = True
+
+
+def migrate_database() -> None:
+    """Apply schema migrations and index maintenance (once per process)."""
+    # migrations builds on this module, so it is imported on first use
+    from migrations import migrate
+    migrate()
+
+
+def _load_user_directory() -> Dict[str, Any]:
+    with read_connection() as conn:
+        rows = conn.execute("SELECT username, full_name, role FROM Users ORDER BY username").fetchall()
+    users = [{"username": r[0], "full_name": r[1], "role": r[2] or "viewer"} for r in rows]
+    return {
+        "users": users,
+        "usernames": [u["username"] for u in users],
+        "roles": {u["username"]: u["role"] for u in users},
+        "admins": sum(1 for u in users if u["role"] == "admin"),
+    }
+
+
+def get_user_directory() -> Dict[str, Any]:
+    """Usernames, names and roles, cached until Users changes.
+
+    create_user, update_user_role, update_full_name and delete_user bump the
+    Users version; edits from other processes are seen through data_version.
+    """
+    ensure_users_table()
+    return cached_derived("users:directory", [USERS_TABLE], _load_user_directory)
 
 
 def get_user_count() -> int:
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        row = conn.execute("SELECT COUNT(*) FROM Users").fetchone()
-        return int(row[0]) if row else 0
-    finally:
-        conn.close()
+    return len(get_user_directory()["usernames"])
 
 
 def create_user(username: str, raw_password: str, full_name: Optional[str] = None, role: str = "viewer") -> None:
     ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
+    password_hash = _run_hash(_hash_password, raw_password)
+    with write_connection() as conn:
         conn.execute(
             "INSERT INTO Users(username, password_hash, full_name, role) VALUES (?, ?, ?, ?)",
-            (username, _hash_password(raw_password), full_name, role),
+            (username, password_hash, full_name, role),
         )
-        conn.commit()
-    finally:
-        conn.close()
+    bump_table_version(USERS_TABLE)
 
 
-def verify_user(username: str, raw_password: str) -> Optional[Dict[str, str]]:
-    ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
+def _upgrade_legacy_hash(username: str, raw_password: str, legacy_hash: str) -> None:
+    """Re-hash a legacy SHA-256 password with PBKDF2; runs on the hash pool."""
     try:
-        cur = conn.execute(
+        new_hash = _hash_password(raw_password)
+        with write_connection() as conn:
+            # Skip if the password was changed meanwhile
+            cur = conn.execute(
+                "UPDATE Users SET password_hash = ? WHERE username = ? AND password_hash = ?",
+                (new_hash, username, legacy_hash),
+            )
+        if cur.rowcount:
+            with _auth_lock:
+                _auth_counters["legacy_upgrades"] += 1
+    except Exception:
+        pass
+
+
+def verify_user(username: str, raw_password: str, client_ip: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """Check a username and password; returns the user or None.
+
+    Raises LoginThrottledError, before any hashing, when the username or
+    client address has too many recent failures or the hash pool is full.
+    """
+    ensure_users_table()
+    _check_login_allowed(username, client_ip)
+    with read_connection() as conn:
+        row = conn.execute(
             "SELECT username, password_hash, full_name, role FROM Users WHERE username = ?",
             (username,),
+        ).fetchone()
+    if not row:
+        _record_login_result(username, False, client_ip)
+        return None
+    stored_hash = row[1]
+    if not _run_hash(_verify_password, raw_password, stored_hash):
+        _record_login_result(username, False, client_ip)
+        return None
+    _record_login_result(username, True)
+    user = {"username": row[0], "full_name": row[2], "role": row[3] or "viewer"}
+    # Opportunistic upgrade of legacy hashes, off the sign-in path; it takes a
+    # hash slot like any other hash and is skipped (retried at the next
+    # sign-in) when the pool is full
+    if not stored_hash.startswith("pbkdf2$") and _hash_slots.acquire(blocking=False):
+        try:
+            future = _hash_executor.submit(_upgrade_legacy_hash, row[0], raw_password, stored_hash)
+        except Exception:
+            _hash_slots.release()
+        else:
+            future.add_done_callback(lambda _: _hash_slots.release())
+    return user
+
+
+# -----------------
+# Session tokens
+# -----------------
+# A sign-in issues "<session id>.<expiry>.<HMAC>" in a cookie. Reloads and
+# reconnects present it instead of a password: the signature is checked in
+# constant time, then one primary-key lookup confirms the session is not
+# revoked or expired, so no PBKDF2 work is done.
+#
+# The cookie is set from a component script, so it cannot be HttpOnly and any
+# script on the page can read it. To limit what a leaked token is worth it is
+# short-lived (SESSION_TTL_SECONDS), only valid while its _sessions row is
+# unrevoked and unexpired, and renewed in place while the user is active.
+
+SESSIONS_TABLE = "_sessions"
+SESSION_COOKIE = "mya_session"
+SESSION_TTL_SECONDS = int(float(os.environ.get("MYA_SESSION_TTL_HOURS", "1")) * 3600)
+# Signed-in sessions re-check revocation at most this often
+SESSION_RECHECK_SECONDS = 60
+SESSION_SECRET_FILE = os.environ.get("MYA_SESSION_SECRET_FILE", ".mya_session_secret")
+
+_secret_lock = threading.Lock()
+_session_secret_value: Optional[bytes] = None
+
+
+def _session_secret() -> bytes:
+    """Server signing key: MYA_SESSION_SECRET, else a random key kept in SESSION_SECRET_FILE."""
+    global _session_secret_value
+    with _secret_lock:
+        if _session_secret_value is None:
+            configured = os.environ.get("MYA_SESSION_SECRET")
+            if configured:
+                _session_secret_value = configured.encode("utf-8")
+            elif os.path.exists(SESSION_SECRET_FILE):
+                with open(SESSION_SECRET_FILE, "rb") as f:
+                    _session_secret_value = f.read().strip()
+            else:
+                key = secrets.token_hex(32).encode("ascii")
+                fd = os.open(SESSION_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(key)
+                _session_secret_value = key
+        return _session_secret_value
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_session_secret(), payload.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def create_session(username: str) -> str:
+    """Record a new session for username and return its signed token."""
+    session_id = secrets.token_urlsafe(18)
+    now = time.time()
+    expires_at = int(now + SESSION_TTL_SECONDS)
+    with write_connection() as conn:
+        conn.execute(f"DELETE FROM {quote_ident(SESSIONS_TABLE)} WHERE expires_at < ?", (now,))
+        conn.execute(
+            f"INSERT INTO {quote_ident(SESSIONS_TABLE)}(session_id, username, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (session_id, username, now, expires_at),
         )
-        row = cur.fetchone()
-        if not row:
-            return None
-        stored_hash = row[1]
-        if _verify_password(raw_password, stored_hash):
-            user = {"username": row[0], "full_name": row[2], "role": row[3] or "viewer"}
-            # Opportunistic upgrade of legacy hashes
-            if not stored_hash.startswith("pbkdf2$"):
-                try:
-                    new_hash = _hash_password(raw_password)
-                    conn.execute("UPDATE Users SET password_hash = ? WHERE username = ?", (new_hash, username))
-                    conn.commit()
-                except Exception:
-                    pass
-            return user
+    return _session_token(session_id, expires_at)
+
+
+def _session_token(session_id: str, expires_at: int) -> str:
+    payload = f"{session_id}.{expires_at}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def renew_session(session_id: str) -> Optional[str]:
+    """Push a live session's expiry out by SESSION_TTL_SECONDS; returns the new token, or None if it is gone."""
+    now = time.time()
+    expires_at = int(now + SESSION_TTL_SECONDS)
+    with write_connection() as conn:
+        cur = conn.execute(
+            f"UPDATE {quote_ident(SESSIONS_TABLE)} SET expires_at = ? "
+            "WHERE session_id = ? AND revoked = 0 AND expires_at > ?",
+            (expires_at, session_id, now),
+        )
+    return _session_token(session_id, expires_at) if cur.rowcount else None
+
+
+def _check_session(session_id: str) -> Optional[Dict[str, str]]:
+    with read_connection() as conn:
+        row = conn.execute(
+            f"""
+            SELECT u.username, u.full_name, u.role
+            FROM {quote_ident(SESSIONS_TABLE)} s JOIN Users u ON u.username = s.username
+            WHERE s.session_id = ? AND s.revoked = 0 AND s.expires_at > ?
+            """,
+            (session_id, time.time()),
+        ).fetchone()
+    if not row:
         return None
-    finally:
-        conn.close()
+    return {"username": row[0], "full_name": row[1], "role": row[2] or "viewer"}
+
+
+def validate_session_token(token: Optional[str]) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Return (session id, user) for a valid, unexpired, unrevoked token."""
+    if not token:
+        return None
+    try:
+        session_id, expires_str, signature = token.split(".")
+        expires_at = int(expires_str)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(f"{session_id}.{expires_str}")):
+        return None
+    if expires_at <= time.time():
+        return None
+    user = _check_session(session_id)
+    return (session_id, user) if user else None
+
+
+def revoke_session(session_id: str) -> None:
+    with write_connection() as conn:
+        conn.execute(f"UPDATE {quote_ident(SESSIONS_TABLE)} SET revoked = 1 WHERE session_id = ?", (session_id,))
+
+
+def revoke_user_sessions(username: str, keep_session_id: Optional[str] = None) -> int:
+    """Revoke every session of a user (optionally but one); returns how many."""
+    with write_connection() as conn:
+        cur = conn.execute(
+            f"UPDATE {quote_ident(SESSIONS_TABLE)} SET revoked = 1 "
+            "WHERE username = ? AND revoked = 0 AND session_id IS NOT ?",
+            (username, keep_session_id),
+        )
+        return cur.rowcount
+
+
+def _session_cookie() -> Optional[str]:
+    try:
+        return st.context.cookies.get(SESSION_COOKIE)
+    except Exception:
+        return None
+
+
+def _write_session_cookie(token: str) -> None:
+    """Set (or with an empty token, clear) the session cookie in the browser.
+
+    Written by script, so the cookie is readable by JavaScript (not HttpOnly).
+    """
+    from streamlit.components.v1 import html as component_html
+    max_age = SESSION_TTL_SECONDS if token else 0
+    component_html(
+        f"""
+        <script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{SESSION_COOKIE}={token}; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+        </script>
+        """,
+        height=0,
+    )
+
+
+def _restore_session() -> Optional[Dict[str, str]]:
+    """Sign the browser back in from its session cookie, or re-check a signed-in session."""
+    session_id = st.session_state.get("auth_session_id")
+    if st.session_state.get("auth_user"):
+        if session_id and time.time() - st.session_state.get("auth_checked_at", 0.0) > SESSION_RECHECK_SECONDS:
+            user = _check_session(session_id)
+            if user is None:
+                # Revoked elsewhere (logout, password change, admin)
+                st.session_state["auth_user"] = None
+                st.session_state["auth_session_id"] = None
+                return None
+            st.session_state["auth_user"] = user
+            st.session_state["auth_checked_at"] = time.time()
+            # Active sessions get a fresh token once half of its lifetime is used
+            if st.session_state.get("auth_expires_at", 0) - time.time() < SESSION_TTL_SECONDS / 2:
+                token = renew_session(session_id)
+                if token:
+                    _set_session_token(token)
+        return st.session_state["auth_user"]
+    if st.session_state.get("auth_signed_out"):
+        # The cookie captured at connect time belongs to the revoked session
+        return None
+    cookie = _session_cookie()
+    restored = validate_session_token(cookie)
+    if restored is None:
+        return None
+    st.session_state["auth_session_id"], st.session_state["auth_user"] = restored
+    st.session_state["auth_expires_at"] = int(cookie.split(".")[1])
+    st.session_state["auth_checked_at"] = time.time()
+    return st.session_state["auth_user"]
+
+
+def _set_session_token(token: str) -> None:
+    session_id, expires_at, _ = token.split(".")
+    st.session_state["auth_session_id"] = session_id
+    st.session_state["auth_expires_at"] = int(expires_at)
+    st.session_state["auth_cookie_pending"] = token
+
+
+def _start_session(user: Dict[str, str]) -> None:
+    token = create_session(user["username"])
+    st.session_state["auth_user"] = user
+    _set_session_token(token)
+    st.session_state["auth_checked_at"] = time.time()
+    st.session_state["auth_signed_out"] = False
 
 
 def logout_current_user() -> None:
+    session_id = st.session_state.get("auth_session_id")
+    if session_id:
+        revoke_session(session_id)
     st.session_state["auth_user"] = None
+    st.session_state["auth_session_id"] = None
+    st.session_state["auth_cookie_pending"] = ""
+    st.session_state["auth_signed_out"] = True
 
 
 def require_login(render_sidebar_user: bool = True) -> Optional[Dict[str, str]]:
@@ -153,17 +1770,23 @@ def require_login(render_sidebar_user: bool = True) -> Optional[Dict[str, str]]:
     - When logged in, optionally renders user info and Logout in the sidebar.
     """
     init_session_state()
+    # Theme CSS and logo are emitted here, once per run, for every page
+    apply_theme()
     ensure_users_table()
+    migrate_database()
+    track_session_memory()
 
-    # Already logged in
-    current_user = st.session_state.get("auth_user")
+    # Already logged in, or returning with a valid session cookie
+    current_user = _restore_session()
+    # Cookie changes are written on the render after sign-in/out, since
+    # st.rerun() would discard a component emitted in the same run
+    pending_cookie = st.session_state.get("auth_cookie_pending")
+    if pending_cookie is not None:
+        _write_session_cookie(pending_cookie)
+        st.session_state["auth_cookie_pending"] = None
     if current_user:
         if render_sidebar_user:
             with st.sidebar:
-                # Add logo to sidebar
-                show_logo()
-                
-                
                 st.caption("Signed in")
                 st.write(f"👤 {current_user.get('full_name') or current_user['username']}")
                 st.write(f"🔑 Role: {current_user.get('role', 'viewer')}")
@@ -235,19 +1858,6 @@ def require_login(render_sidebar_user: bool = True) -> Optional[Dict[str, str]]:
 
     # First-run: create initial user if table empty
     if get_user_count() == 0:
-        # Add custom CSS for title fonts
-        st.markdown("""
-        <style>
-        h1, h2, h3, h4, h5, h6 {
-            font-family: 'CormorantGaramond', serif !important;
-            font-weight: 500 !important;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-        
-        # Add logo to admin setup page
-        show_logo()
-        
         st.title("🔐 Set up Admin Account")
         st.info("No users found. Create the first account to continue.")
         with st.form("create_first_user"):
@@ -272,56 +1882,42 @@ def require_login(render_sidebar_user: bool = True) -> Optional[Dict[str, str]]:
         st.stop()
 
     # Normal login flow
-    # Add custom CSS for title fonts
-    st.markdown("""
-    <style>
-    h1, h2, h3, h4, h5, h6 {
-        font-family: 'CormorantGaramond', serif !important;
-        font-weight: 500 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    # Add logo to login page
-    show_logo()
-    
     st.title("🔒 Login")
     with st.form("login_form"):
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         submitted = st.form_submit_button("Sign in")
     if submitted:
-        user = verify_user(username, password)
-        if user:
-            st.session_state["auth_user"] = user
-            st.success("Signed in")
-            st.rerun()
+        try:
+            user = verify_user(username, password, _client_ip())
+        except LoginThrottledError as e:
+            st.error(f"{e} (retry in {max(1, math.ceil(e.retry_after))} s)")
         else:
-            st.error("Invalid username or password")
+            if user:
+                _start_session(user)
+                st.success("Signed in")
+                st.rerun()
+            else:
+                st.error("Invalid username or password")
     st.stop()
 
 
 def change_password(username: str, new_password: str) -> None:
     ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
+    password_hash = _run_hash(_hash_password, new_password)
+    with write_connection() as conn:
         conn.execute(
             "UPDATE Users SET password_hash = ? WHERE username = ?",
-            (_hash_password(new_password), username),
+            (password_hash, username),
         )
-        conn.commit()
-    finally:
-        conn.close()
+        # Sign out other devices; the session changing its own password stays
+        current = st.session_state.get("auth_user")
+        own = current is not None and current.get("username") == username
+        revoke_user_sessions(username, st.session_state.get("auth_session_id") if own else None)
 
 
 def list_usernames() -> List[str]:
-    ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        rows = conn.execute("SELECT username FROM Users ORDER BY username").fetchall()
-        return [r[0] for r in rows]
-    finally:
-        conn.close()
+    return list(get_user_directory()["usernames"])
 
 
 def is_admin() -> bool:
@@ -330,28 +1926,16 @@ def is_admin() -> bool:
 
 
 def list_users() -> List[Dict[str, Any]]:
-    ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        rows = conn.execute(
-            "SELECT username, full_name, role FROM Users ORDER BY username"
-        ).fetchall()
-        return [
-            {"username": r[0], "full_name": r[1], "role": r[2] or "viewer"}
-            for r in rows
-        ]
-    finally:
-        conn.close()
+    return [dict(user) for user in get_user_directory()["users"]]
+
+
+def _count_admins(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT COUNT(*) FROM Users WHERE role = 'admin'").fetchone()
+    return int(row[0]) if row else 0
 
 
 def get_admin_count() -> int:
-    ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        row = conn.execute("SELECT COUNT(*) FROM Users WHERE role = 'admin'").fetchone()
-        return int(row[0]) if row else 0
-    finally:
-        conn.close()
+    return get_user_directory()["admins"]
 
 
 def update_user_role(username: str, new_role: str) -> None:
@@ -359,8 +1943,7 @@ def update_user_role(username: str, new_role: str) -> None:
     if new_role not in ("admin", "viewer"):
         raise ValueError("Invalid role")
     current = st.session_state.get("auth_user")
-    conn = sqlite3.connect(DB_FILE)
-    try:
+    with write_connection() as conn:
         # if demoting an admin, ensure there's at least one other admin
         row = conn.execute(
             "SELECT role FROM Users WHERE username = ?", (username,)
@@ -369,36 +1952,31 @@ def update_user_role(username: str, new_role: str) -> None:
             raise ValueError("User not found")
         old_role = row[0] or "viewer"
         if old_role == "admin" and new_role != "admin":
-            if get_admin_count() <= 1:
+            if _count_admins(conn) <= 1:
                 raise ValueError("Cannot demote the last admin")
         conn.execute(
             "UPDATE Users SET role = ? WHERE username = ?",
             (new_role, username),
         )
-        conn.commit()
-        # If the current user changed their own role, update session
-        if current and current.get("username") == username:
-            current["role"] = new_role
-            st.session_state["auth_user"] = current
-    finally:
-        conn.close()
+    bump_table_version(USERS_TABLE)
+    # If the current user changed their own role, update session
+    if current and current.get("username") == username:
+        current["role"] = new_role
+        st.session_state["auth_user"] = current
 
 
 def update_full_name(username: str, full_name: Optional[str]) -> None:
     ensure_users_table()
-    conn = sqlite3.connect(DB_FILE)
-    try:
+    with write_connection() as conn:
         conn.execute(
             "UPDATE Users SET full_name = ? WHERE username = ?",
             (full_name, username),
         )
-        conn.commit()
-        current = st.session_state.get("auth_user")
-        if current and current.get("username") == username:
-            current["full_name"] = full_name
-            st.session_state["auth_user"] = current
-    finally:
-        conn.close()
+    bump_table_version(USERS_TABLE)
+    current = st.session_state.get("auth_user")
+    if current and current.get("username") == username:
+        current["full_name"] = full_name
+        st.session_state["auth_user"] = current
 
 
 def delete_user(username: str) -> None:
@@ -406,8 +1984,7 @@ def delete_user(username: str) -> None:
     current = st.session_state.get("auth_user")
     if current and current.get("username") == username:
         raise ValueError("You cannot delete the currently signed-in user")
-    conn = sqlite3.connect(DB_FILE)
-    try:
+    with write_connection() as conn:
         # Prevent deleting last admin
         row = conn.execute(
             "SELECT role FROM Users WHERE username = ?",
@@ -416,45 +1993,70 @@ def delete_user(username: str) -> None:
         if not row:
             raise ValueError("User not found")
         role = row[0] or "viewer"
-        if role == "admin" and get_admin_count() <= 1:
+        if role == "admin" and _count_admins(conn) <= 1:
             raise ValueError("Cannot delete the last admin user")
         conn.execute("DELETE FROM Users WHERE username = ?", (username,))
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute(f"DELETE FROM {quote_ident(SESSIONS_TABLE)} WHERE username = ?", (username,))
+    bump_table_version(USERS_TABLE)
 
-def show_logo():
-    """Render app logo with a proper icon image.
 
-    Uses PIL to ensure valid image objects are passed to st.logo to avoid
-    StreamlitAPIException about invalid icon_image types.
-    """
-    try:
-        from PIL import Image  # type: ignore
-    except Exception:
-        # Fallback: pass file paths directly
-        st.logo(
-            "static/Images/MYAlogo_white.png",
-            icon_image="static/Images/MYALogo.png",
-            size="large",
-        )
-        return
+# -----------------
+# Static assets
+# -----------------
+# Logo files are read once per process and kept as their encoded bytes, so
+# reruns do no file I/O or PIL decode/re-encode; Streamlit serves them under
+# content-hash URLs, which browsers cache. Fonts are registered through
+# theme.fontFaces in .streamlit/config.toml.
 
-    main_path = os.path.join("static", "Images", "MYAlogo_white.png")
-    icon_path = os.path.join("static", "Images", "MYALogo.png")
+STATIC_DIR = "static"
+ASSET_FILES = {
+    "logo": os.path.join("Images", "MYAlogo_white.png"),
+    "logo_icon": os.path.join("Images", "MYALogo.png"),
+}
+THEME_CSS = """
+<style>
+h1, h2, h3, h4, h5, h6 {
+    font-family: 'CormorantGaramond', serif !important;
+    font-weight: 500 !important;
+}
+</style>
+"""
 
+_assets_lock = threading.Lock()
+_assets: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def _read_asset(relative_path: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(STATIC_DIR, relative_path)
     try:
-        main_img = Image.open(main_path)
-    except Exception:
-        main_img = None
-    try:
-        icon_img = Image.open(icon_path)
-    except Exception:
-        icon_img = None
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return {"path": path, "bytes": data, "sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
 
-    # Prefer PIL images when available; otherwise, pass the path strings
-    st.logo(
-        main_img if main_img is not None else main_path,
-        icon_image=icon_img if icon_img is not None else icon_path,
-        size="large",
-    )
+
+def get_assets() -> Dict[str, Dict[str, Any]]:
+    """Static assets by name (bytes and content hash), loaded on first use; missing files are left out."""
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                loaded = {name: _read_asset(rel) for name, rel in ASSET_FILES.items()}
+                _assets = {name: asset for name, asset in loaded.items() if asset is not None}
+    return _assets
+
+
+def show_logo():
+    """Render the app logo (sidebar and collapsed icon) from the asset registry."""
+    assets = get_assets()
+    if "logo" not in assets:
+        return
+    icon = assets.get("logo_icon")
+    st.logo(assets["logo"]["bytes"], icon_image=icon["bytes"] if icon else None, size="large")
+
+
+def apply_theme() -> None:
+    """Emit the theme CSS and logo; require_login calls this once per run."""
+    st.markdown(THEME_CSS, unsafe_allow_html=True)
+    show_logo()
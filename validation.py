@@ -0,0 +1,263 @@
+"""Declarative validation and normalization for imported tables.
+
+RULES says, per table, which columns to trim, which values to rewrite
+(alias maps), which values are allowed, how columns are typed, which keys
+are required and which must be unique. validate() applies them with
+vectorized pandas operations over a whole parsed sheet and returns the
+cleaned frame plus one violation record per problem found; ingest.py stores
+those in _import_violations.
+
+Violation actions:
+  fixed     value rewritten by an alias map
+  moved     value not allowed, moved to the overflow column
+  flagged   value kept, but needs attention (not allowed, duplicate key)
+  cleared   value could not be coerced to the column type and was blanked
+  rejected  row missing a required key, not imported
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from utils import FEEDBACK_TABLE, PARTNER_TABLE, SERVICE_TABLE, TOUR_TABLE, quote_ident
+
+VIOLATIONS_TABLE = "_import_violations"
+VIOLATION_COLUMNS = ["source_row", "column_name", "rule", "value", "action"]
+
+# Aliases match case-insensitively on the trimmed value.
+# "required" lists column groups; a row needs a value in at least one column of each group.
+RULES: Dict[str, Dict[str, Any]] = {
+    PARTNER_TABLE: {
+        "trim": True,
+        "aliases": {
+            "Status": {"approved": "Approved", "banned": "Banned", "suspended": "Suspended"},
+            "Location": {"hanoi": "Ha Noi", "ha noi": "Ha Noi", "ho chi minh city": "Ho Chi Minh City"},
+        },
+        # column -> (allowed values, overflow column for anything else)
+        "allowed": {"Status": (["Banned", "Approved", "Suspended"], "Note")},
+        "types": {"Date Added": "date"},
+        "required": [["Partner ID"]],
+        "unique": ["Partner ID"],
+    },
+    FEEDBACK_TABLE: {
+        "trim": True,
+        "aliases": {"Feedback Type": {"good": "Good", "neutral": "Neutral", "bad": "Bad"}},
+        "allowed": {"Feedback Type": (["Good", "Neutral", "Bad"], None)},
+        "types": {"Date": "date"},
+        "required": [["Partner ID", "Partner Name"]],
+    },
+    SERVICE_TABLE: {
+        "trim": True,
+        "types": {
+            "Date Quotation": "date",
+            "Date of Service": "date",
+            "Price quoted": "number",
+            "Price final": "number",
+        },
+        "required": [["Partner ID", "Partner Name"]],
+    },
+    TOUR_TABLE: {
+        "trim": True,
+        "types": {"Number of days": "integer", "num_pax": "integer", "price": "number"},
+        "required": [["Tour Name"]],
+    },
+}
+
+
+def overflow_columns(table_name: str) -> List[str]:
+    """Columns validate() adds to the table when the sheet lacks them."""
+    return [overflow for _, overflow in RULES.get(table_name, {}).get("allowed", {}).values() if overflow]
+
+
+def _violations(rows: pd.Index, column: str, rule: str, values: pd.Series, action: str) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "source_row": rows,
+            "column_name": column,
+            "rule": rule,
+            "value": values.astype(str).to_numpy(),
+            "action": action,
+        }
+    )
+
+
+def _trim(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip surrounding whitespace (including NBSP) from text cells; blank text becomes empty."""
+    for col in df.columns:
+        series = df[col]
+        if is_numeric_dtype(series) or is_datetime64_any_dtype(series):
+            continue
+        try:
+            stripped = series.str.strip()  # NaN for cells that are not text
+        except AttributeError:
+            continue
+        is_text = stripped.notna()
+        df[col] = series.astype(object).where(~is_text, stripped.where(stripped.ne(""), None))
+    return df
+
+
+def _apply_aliases(df: pd.DataFrame, aliases: Dict[str, Dict[str, str]], found: List[pd.DataFrame]) -> None:
+    for col, mapping in aliases.items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        lookup = {k.lower(): v for k, v in mapping.items()}
+        replaced = series.astype(str).str.lower().map(lookup)
+        changed = replaced.notna() & series.notna() & replaced.ne(series)
+        if changed.any():
+            found.append(_violations(df.index[changed], col, "alias", series[changed], "fixed"))
+            df.loc[changed, col] = replaced[changed]
+
+
+def _apply_allowed(df: pd.DataFrame, allowed: Dict[str, Tuple[Sequence[str], Any]], found: List[pd.DataFrame]) -> None:
+    for col, (values, overflow) in allowed.items():
+        if col not in df.columns:
+            continue
+        # The overflow column always exists, so the table's columns do not depend on the data
+        if overflow and overflow not in df.columns:
+            df[overflow] = None
+        series = df[col]
+        bad = series.notna() & ~series.isin(list(values))
+        if not bad.any():
+            continue
+        if overflow:
+            found.append(_violations(df.index[bad], col, "allowed", series[bad], "moved"))
+            existing = df[overflow]
+            moved = series.where(bad)
+            joined = existing.astype(str) + "; " + moved.astype(str)
+            df[overflow] = existing.where(~bad, moved.where(existing.isna(), joined))
+            df[col] = series.where(~bad, None)
+        else:
+            found.append(_violations(df.index[bad], col, "allowed", series[bad], "flagged"))
+
+
+_ISO_DATE_RE = r"^\s*\d{4}-\d{1,2}-\d{1,2}"
+
+
+def _to_datetime(series: pd.Series) -> pd.Series:
+    """Coerce to datetimes: ISO text (YYYY-MM-DD...) as ISO 8601, everything else day-first."""
+    try:
+        # Cells that are not text come back as NaN from .str and are not ISO
+        iso = series.astype(object).str.match(_ISO_DATE_RE, na=False)
+    except AttributeError:
+        # No text at all (datetimes, numbers, blanks)
+        iso = pd.Series(False, index=series.index)
+    coerced = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    if iso.any():
+        coerced[iso] = pd.to_datetime(series[iso].str.strip(), errors="coerce", format="ISO8601")
+    if (~iso).any():
+        coerced[~iso] = pd.to_datetime(series[~iso], errors="coerce", format="mixed", dayfirst=True)
+    return coerced
+
+
+def _apply_types(df: pd.DataFrame, types: Dict[str, str], found: List[pd.DataFrame]) -> None:
+    for col, kind in types.items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if kind == "date":
+            if is_datetime64_any_dtype(series):
+                continue
+            coerced = _to_datetime(series)
+        else:
+            coerced = pd.to_numeric(series, errors="coerce")
+            if kind == "integer":
+                fractional = coerced.notna() & coerced.ne(coerced.round())
+                coerced = coerced.where(~fractional).astype("Int64")
+        failed = series.notna() & coerced.isna()
+        if failed.any():
+            found.append(_violations(df.index[failed], col, f"type:{kind}", series[failed], "cleared"))
+        df[col] = coerced
+
+
+def _apply_required(df: pd.DataFrame, groups: Sequence[Sequence[str]], found: List[pd.DataFrame]) -> pd.DataFrame:
+    keep = pd.Series(True, index=df.index)
+    for group in groups:
+        present = [c for c in group if c in df.columns]
+        if not present:
+            continue
+        missing = df[present].isna().all(axis=1)
+        if missing.any():
+            found.append(_violations(df.index[missing], " / ".join(present), "required", df.loc[missing, present[0]], "rejected"))
+        keep &= ~missing
+    return df[keep]
+
+
+def _apply_unique(
+    df: pd.DataFrame, columns: Sequence[str], found: List[pd.DataFrame], seen: Optional[Dict[str, Dict[Any, Any]]] = None
+) -> None:
+    # seen carries {column: {value: first row, or None once flagged}} across the chunks of one sheet
+    for col in columns:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        present = series.notna()
+        duplicated = present & series.duplicated(keep=False)
+        if seen is not None:
+            first_rows = seen.setdefault(col, {})
+            earlier = present & series.isin(list(first_rows))
+            duplicated |= earlier
+            # The first occurrence was in an earlier chunk and is flagged now
+            for value in series[earlier].unique():
+                if first_rows[value] is not None:
+                    found.append(_violations(pd.Index([first_rows[value]]), col, "unique", pd.Series([value]), "flagged"))
+                    first_rows[value] = None
+            for row, value in series[present & ~earlier].drop_duplicates().items():
+                first_rows[value] = None if duplicated[row] else row
+        if duplicated.any():
+            found.append(_violations(df.index[duplicated], col, "unique", series[duplicated], "flagged"))
+
+
+def validate(
+    table_name: str, df: pd.DataFrame, seen: Optional[Dict[str, Dict[Any, Any]]] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Apply RULES[table_name]; returns (clean frame, violations).
+
+    The frame's index is taken to be the source row number and is kept.
+    To validate a sheet chunk by chunk, pass the same (initially empty) seen
+    dict for every chunk so uniqueness is checked across the whole sheet.
+    """
+    rules = RULES.get(table_name, {})
+    found: List[pd.DataFrame] = []
+    # Entirely blank rows are spreadsheet padding, not records
+    df = df[df.notna().any(axis=1)].copy()
+    if rules.get("trim"):
+        df = _trim(df)
+    _apply_aliases(df, rules.get("aliases", {}), found)
+    _apply_allowed(df, rules.get("allowed", {}), found)
+    _apply_types(df, rules.get("types", {}), found)
+    df = _apply_required(df, rules.get("required", []), found)
+    _apply_unique(df, rules.get("unique", []), found, seen)
+    violations = pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return df, violations
+
+
+def record_violations(conn, table_name: str, violations: pd.DataFrame) -> None:
+    """Replace the stored violations of one table; call inside the import transaction."""
+    table = quote_ident(VIOLATIONS_TABLE)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            table_name TEXT NOT NULL,
+            source_row INTEGER,
+            column_name TEXT,
+            rule TEXT NOT NULL,
+            value TEXT,
+            action TEXT NOT NULL,
+            checked_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_ident(VIOLATIONS_TABLE + '_table')} ON {table}(table_name)")
+    conn.execute(f"DELETE FROM {table} WHERE table_name = ?", (table_name,))
+    checked_at = time.strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany(
+        f"INSERT INTO {table}(table_name, source_row, column_name, rule, value, action, checked_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (table_name, int(row), column, rule, value, action, checked_at)
+            for row, column, rule, value, action in violations[VIOLATION_COLUMNS].itertuples(index=False, name=None)
+        ],
+    )